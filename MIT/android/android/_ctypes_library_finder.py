@@ -1,7 +1,7 @@
 import os
 
 
-def get_activity_lib_dir(activity_name):
+def get_activity_app_info(activity_name):
     from jnius import autoclass
 
     # Get the actual activity instance:
@@ -18,14 +18,42 @@ def get_activity_lib_dir(activity_name):
     if activity is None:
         return None
 
-    # Extract the native lib dir from the activity instance:
     package_name = activity.getApplicationContext().getPackageName()
     manager = activity.getApplicationContext().getPackageManager()
     manager_class = autoclass("android.content.pm.PackageManager")
-    native_lib_dir = manager.getApplicationInfo(
+    return manager.getApplicationInfo(
         package_name, manager_class.GET_SHARED_LIBRARY_FILES
-    ).nativeLibraryDir
-    return native_lib_dir
+    )
+
+
+def get_activity_lib_dir(activity_name):
+    app_info = get_activity_app_info(activity_name)
+    if app_info is None:
+        return None
+    return app_info.nativeLibraryDir
+
+
+def find_apk_library(name, activity_name):
+    # With extractNativeLibs false the lib dir is empty, and the libs are
+    # loaded straight from the APK by their bare file name:
+    from jnius import autoclass
+    from zipfile import ZipFile
+    app_info = get_activity_app_info(activity_name)
+    if app_info is None:
+        return None
+    abi_to_names = {}
+    with ZipFile(app_info.sourceDir) as zf:
+        for entry_name in zf.namelist():
+            parts = entry_name.split("/")
+            if len(parts) == 3 and parts[0] == "lib":
+                abi_to_names.setdefault(parts[1], []).append(parts[2])
+    for abi in autoclass("android.os.Build").SUPPORTED_ABIS:
+        if abi in abi_to_names:
+            for file_name in abi_to_names[abi]:
+                if does_libname_match_filename(name, file_name):
+                    return file_name
+            break
+    return None
 
 
 def does_libname_match_filename(search_name, file_path):
@@ -51,8 +79,16 @@ def find_library(name):
     if lib_dir_2 is not None and lib_dir_2 not in lib_search_dirs:
         lib_search_dirs.insert(0, lib_dir_2)
 
-    # Now scan the lib dirs:
-    for lib_dir in [l for l in lib_search_dirs if os.path.exists(l)]:
+    # Now scan the lib dirs, and the APK before the system:
+    for lib_dir in lib_search_dirs:
+        if lib_dir == "/system/lib":
+            for activity_name in ("org.kivy.android.PythonActivity",
+                                  "org.kivy.android.PythonService"):
+                file_name = find_apk_library(name, activity_name)
+                if file_name is not None:
+                    return file_name
+        if not os.path.exists(lib_dir):
+            continue
         filelist = [
             f for f in os.listdir(lib_dir)
             if does_libname_match_filename(name, f)
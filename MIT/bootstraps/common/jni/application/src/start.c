@@ -201,6 +201,10 @@ int main(int argc, char *argv[]) {
                        "sys.argv = ['notaninterpreterreally']\n"
                        "from os.path import realpath, join, dirname");
     PyRun_SimpleString(add_site_packages_dir);
+    snprintf(add_site_packages_dir, 256,
+             "sys.path.append('%s/site-packages.zip')",
+             python_bundle_dir);
+    PyRun_SimpleString(add_site_packages_dir);
     /* "sys.path.append(join(dirname(realpath(__file__)), 'site-packages'))") */
     PyRun_SimpleString("sys.path = ['.'] + sys.path");
   }
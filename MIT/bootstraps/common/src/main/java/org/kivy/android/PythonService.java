@@ -166,7 +166,7 @@ public class PythonService extends Service implements Runnable {
         String app_root =  getFilesDir().getAbsolutePath() + "/app";
         File app_root_file = new File(app_root);
         PythonUtil.loadLibraries(app_root_file,
-            new File(getApplicationInfo().nativeLibraryDir));
+            new File(getApplicationInfo().sourceDir));
         this.mService = this;
         nativeStart(
             androidPrivate, androidArgument,
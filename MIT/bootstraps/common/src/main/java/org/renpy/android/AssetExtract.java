@@ -5,6 +5,7 @@ package org.renpy.android;
 import java.io.*;
 
 import android.app.Activity;
+import android.os.Build;
 import android.util.Log;
 
 import java.io.BufferedInputStream;
@@ -15,6 +16,11 @@ import java.io.FileInputStream;
 import java.io.FileOutputStream;
 import java.io.File;
 
+import java.util.HashMap;
+import java.util.HashSet;
+import java.util.Map;
+import java.util.Set;
+import java.util.TreeMap;
 import java.util.zip.GZIPInputStream;
 
 import android.content.res.AssetManager;
@@ -23,6 +29,11 @@ import org.kamranzafar.jtar.*;
 
 public class AssetExtract {
 
+    // First member of the archive, lines of digest and path. See cowpox/archive.py for the reference implementation.
+    public static final String MANIFEST_NAME = ".Cowpox-manifest";
+    // Members under this prefix and then an abi are extracted as if at top level, but only for the chosen abi.
+    public static final String ABI_PREFIX = ".Cowpox-abi";
+
     private AssetManager mAssetManager = null;
     private Activity mActivity = null;
 
@@ -31,16 +42,54 @@ public class AssetExtract {
         mAssetManager = act.getAssets();
     }
 
+    // The version asset is separate from the archive so that it can be replaced without rebuilding resources.
+    public String readVersion(String asset) {
+        try {
+            InputStream is = mAssetManager.open(asset);
+            byte[] data = readFully(is, new byte[64]);
+            is.close();
+            String version = new String(data, "UTF-8").trim();
+            return version.isEmpty() ? null : version;
+        } catch (IOException e) {
+            return null;
+        }
+    }
+
+    public static boolean hasManifest(File target) {
+        return new File(target, MANIFEST_NAME).exists();
+    }
+
     public boolean extractTar(String asset, String target) {
 
         byte buf[] = new byte[1024 * 1024];
 
+        // Files whose digest is unchanged since the last extraction are skipped:
+        File manifestFile = new File(target, MANIFEST_NAME);
+        Map<String, String> oldManifest = new HashMap<String, String>();
+        if (manifestFile.exists()) {
+            try {
+                InputStream in = new FileInputStream(manifestFile);
+                oldManifest = parseManifest(readFully(in, buf));
+                in.close();
+            } catch (IOException e) {
+                Log.w("python", "reading manifest", e);
+            }
+            manifestFile.delete(); // An interrupted extraction must not be trusted next time.
+        }
+        Map<String, String> newManifest = null;
+        String abi = null;
+        int skipped = 0;
+
         InputStream assetStream = null;
         TarInputStream tis = null;
 
         try {
             assetStream = mAssetManager.open(asset, AssetManager.ACCESS_STREAMING);
-            tis = new TarInputStream(new BufferedInputStream(new GZIPInputStream(new BufferedInputStream(assetStream, 8192)), 8192));
+            InputStream bufferedStream = new BufferedInputStream(assetStream, 8192);
+            if (isGzip(bufferedStream)) {
+                bufferedStream = new BufferedInputStream(new GZIPInputStream(bufferedStream), 8192);
+            }
+            tis = new TarInputStream(bufferedStream);
         } catch (IOException e) {
             Log.e("python", "opening up extract tar", e);
             return false;
@@ -60,19 +109,73 @@ public class AssetExtract {
                 break;
             }
 
-            Log.v("python", "extracting " + entry.getName());
+            if (MANIFEST_NAME.equals(entry.getName())) {
+                Map<String, String> archiveManifest;
+                try {
+                    archiveManifest = parseManifest(readFully(tis, buf));
+                } catch ( java.io.IOException e ) {
+                    Log.e("python", "extracting manifest", e);
+                    return false;
+                }
+                Set<String> available = new HashSet<String>();
+                for (String name : archiveManifest.keySet()) {
+                    String[] parts = name.split("/");
+                    if (parts.length > 2 && ABI_PREFIX.equals(parts[0])) {
+                        available.add(parts[1]);
+                    }
+                }
+                if (!available.isEmpty()) {
+                    // Same order of preference as the package manager uses for native libs:
+                    for (String a : Build.SUPPORTED_ABIS) {
+                        if (available.contains(a)) {
+                            abi = a;
+                            break;
+                        }
+                    }
+                    if (abi == null) {
+                        Log.e("python", "no supported abi in " + available);
+                        return false;
+                    }
+                    Log.v("python", "extracting for abi " + abi);
+                }
+                newManifest = new TreeMap<String, String>();
+                for (Map.Entry<String, String> e : archiveManifest.entrySet()) {
+                    String name = abiName(e.getKey(), abi);
+                    if (name != null) {
+                        newManifest.put(name, e.getValue());
+                    }
+                }
+                continue;
+            }
+
+            String name = abiName(entry.getName(), abi);
+            if (name == null) {
+                continue;
+            }
 
             if (entry.isDirectory()) {
 
                 try {
-                    new File(target +"/" + entry.getName()).mkdirs();
+                    new File(target +"/" + name).mkdirs();
                 } catch ( SecurityException e ) { };
 
                 continue;
             }
 
+            String path = target + "/" + name;
+
+            if (newManifest != null) {
+                String digest = newManifest.get(name);
+                File file = new File(path);
+                if (digest != null && digest.equals(oldManifest.get(name)) && file.isFile() && file.length() == entry.getSize()) {
+                    skipped++;
+                    continue;
+                }
+            }
+
+            Log.v("python", "extracting " + name);
+
             OutputStream out = null;
-            String path = target + "/" + entry.getName();
 
             try {
                 out = new BufferedOutputStream(new FileOutputStream(path), 8192);
@@ -110,6 +213,70 @@ public class AssetExtract {
             // pass
         }
 
+        if (newManifest != null) {
+            Log.v("python", "skipped " + skipped + " unchanged files");
+            for (String name : oldManifest.keySet()) {
+                if (!newManifest.containsKey(name)) {
+                    Log.v("python", "deleting " + name);
+                    new File(target, name).delete();
+                }
+            }
+            try {
+                Writer out = new OutputStreamWriter(new FileOutputStream(manifestFile), "UTF-8");
+                for (Map.Entry<String, String> e : newManifest.entrySet()) {
+                    out.write(e.getValue() + " " + e.getKey() + "\n");
+                }
+                out.close();
+            } catch ( java.io.IOException e ) {
+                Log.w("python", "writing manifest", e);
+            }
+        }
+
         return true;
     }
+
+    // Where to extract the given member, or null to skip it.
+    private static String abiName(String name, String abi) {
+        String[] parts = name.split("/", 3);
+        if (!ABI_PREFIX.equals(parts[0])) {
+            return name;
+        }
+        if (parts.length > 2 && parts[1].equals(abi)) {
+            return parts[2];
+        }
+        return null;
+    }
+
+    private static byte[] readFully(InputStream in, byte[] buf) throws IOException {
+        ByteArrayOutputStream out = new ByteArrayOutputStream();
+        while (true) {
+            int len = in.read(buf);
+            if (len == -1) {
+                break;
+            }
+            out.write(buf, 0, len);
+        }
+        return out.toByteArray();
+    }
+
+    private static Map<String, String> parseManifest(byte[] data) throws IOException {
+        Map<String, String> manifest = new HashMap<String, String>();
+        BufferedReader reader = new BufferedReader(new InputStreamReader(new ByteArrayInputStream(data), "UTF-8"));
+        String line;
+        while ((line = reader.readLine()) != null) {
+            int i = line.indexOf(' ');
+            if (i != -1) {
+                manifest.put(line.substring(i + 1), line.substring(0, i));
+            }
+        }
+        return manifest;
+    }
+
+    private static boolean isGzip(InputStream stream) throws IOException {
+        stream.mark(2);
+        int b0 = stream.read();
+        int b1 = stream.read();
+        stream.reset();
+        return 0x1f == b0 && 0x8b == b1;
+    }
 }
@@ -2,25 +2,56 @@ package org.kivy.android;
 
 import java.io.File;
 
+import android.os.Build;
 import android.util.Log;
+import java.io.IOException;
 import java.util.ArrayList;
+import java.util.Enumeration;
+import java.util.HashMap;
+import java.util.Map;
+import java.util.zip.ZipEntry;
+import java.util.zip.ZipFile;
 import java.io.FilenameFilter;
 import java.util.regex.Pattern;
 
 public class PythonUtil {
 	private static final String TAG = "pythonutil";
 
-    protected static void addLibraryIfExists(ArrayList<String> libsList, String pattern, File libsDir) {
+    // Lib file names in the APK for the first supported abi it has, as the package manager chooses.
+    // Unlike nativeLibraryDir this works when the libs are not extracted.
+    protected static ArrayList<String> listLibraries(File apkFile) {
+        Map<String, ArrayList<String>> abiToNames = new HashMap<String, ArrayList<String>>();
+        try {
+            ZipFile zf = new ZipFile(apkFile);
+            Enumeration<? extends ZipEntry> entries = zf.entries();
+            while (entries.hasMoreElements()) {
+                String[] parts = entries.nextElement().getName().split("/");
+                if (parts.length == 3 && "lib".equals(parts[0])) {
+                    if (!abiToNames.containsKey(parts[1])) {
+                        abiToNames.put(parts[1], new ArrayList<String>());
+                    }
+                    abiToNames.get(parts[1]).add(parts[2]);
+                }
+            }
+            zf.close();
+        } catch (IOException e) {
+            Log.w(TAG, "Listing libs in " + apkFile, e);
+        }
+        for (String abi : Build.SUPPORTED_ABIS) {
+            if (abiToNames.containsKey(abi)) {
+                return abiToNames.get(abi);
+            }
+        }
+        return new ArrayList<String>();
+    }
+
+    protected static void addLibraryIfExists(ArrayList<String> libsList, String pattern, ArrayList<String> names) {
         // pattern should be the name of the lib file, without the
         // preceding "lib" or suffix ".so", for instance "ssl.*" will
         // match files of the form "libssl.*.so".
-        File [] files = libsDir.listFiles();
-
         pattern = "lib" + pattern + "\\.so";
         Pattern p = Pattern.compile(pattern);
-        for (int i = 0; i < files.length; ++i) {
-            File file = files[i];
-            String name = file.getName();
+        for (String name : names) {
             Log.v(TAG, "Checking pattern " + pattern + " against " + name);
             if (p.matcher(name).matches()) {
                 Log.v(TAG, "Pattern " + pattern + " matched file " + name);
@@ -29,17 +60,18 @@ public class PythonUtil {
         }
     }
 
-    protected static ArrayList<String> getLibraries(File libsDir) {
+    protected static ArrayList<String> getLibraries(File apkFile) {
+        ArrayList<String> names = listLibraries(apkFile);
         ArrayList<String> libsList = new ArrayList<String>();
-        addLibraryIfExists(libsList, "sqlite3", libsDir);
-        addLibraryIfExists(libsList, "ffi", libsDir);
-        addLibraryIfExists(libsList, "png16", libsDir);
+        addLibraryIfExists(libsList, "sqlite3", names);
+        addLibraryIfExists(libsList, "ffi", names);
+        addLibraryIfExists(libsList, "png16", names);
         libsList.add("SDL2");
         libsList.add("SDL2_image");
         libsList.add("SDL2_mixer");
         libsList.add("SDL2_ttf");
-        addLibraryIfExists(libsList, "ssl.*", libsDir);
-        addLibraryIfExists(libsList, "crypto.*", libsDir);
+        addLibraryIfExists(libsList, "ssl.*", names);
+        addLibraryIfExists(libsList, "crypto.*", names);
         // TODO: Do not guess which lib we have.
         libsList.add("python3.5m");
         libsList.add("python3.6m");
@@ -49,11 +81,11 @@ public class PythonUtil {
         return libsList;
     }
 
-    public static void loadLibraries(File filesDir, File libsDir) {
+    public static void loadLibraries(File filesDir, File apkFile) {
         String filesDirPath = filesDir.getAbsolutePath();
         boolean foundPython = false;
 
-        for (String lib : getLibraries(libsDir)) {
+        for (String lib : getLibraries(apkFile)) {
             Log.v(TAG, "Loading library: " + lib);
             try {
                 System.loadLibrary(lib);
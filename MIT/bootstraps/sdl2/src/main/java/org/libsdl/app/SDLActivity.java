@@ -121,7 +121,11 @@ public class SDLActivity extends Activity implements View.OnSystemUiVisibilityCh
         } else {
             library = "libmain.so";
         }
-        return getContext().getApplicationInfo().nativeLibraryDir + "/" + library;
+        ApplicationInfo info = getContext().getApplicationInfo();
+        if (Build.VERSION.SDK_INT >= 23 && (info.flags & ApplicationInfo.FLAG_EXTRACT_NATIVE_LIBS) == 0) {
+            return library; // Not extracted, the linker finds it in the APK by soname.
+        }
+        return info.nativeLibraryDir + "/" + library;
     }
 
     /**
@@ -231,7 +231,7 @@ public class PythonActivity extends Activity {
         String app_root = new String(getAppRoot());
         File app_root_file = new File(app_root);
         PythonUtil.loadLibraries(app_root_file,
-            new File(getApplicationInfo().nativeLibraryDir));
+            new File(getApplicationInfo().sourceDir));
     }
 
     public void recursiveDelete(File f) {
@@ -271,7 +271,7 @@ public class PythonActivity extends Activity {
         Log.v(TAG, "UNPACKING!!! " + resource + " " + target.getName());
 
         // The version of data in memory and on disk.
-        String data_version = resourceManager.getString(resource + "_version");
+        String data_version = new AssetExtract(this).readVersion(resource + ".version");
         String disk_version = null;
 
         Log.v(TAG, "Data version is " + data_version);
@@ -301,7 +301,9 @@ public class PythonActivity extends Activity {
         if (! data_version.equals(disk_version)) {
             Log.v(TAG, "Extracting " + resource + " assets.");
 
-            recursiveDelete(target);
+            if (!AssetExtract.hasManifest(target)) {
+                recursiveDelete(target); // Otherwise only what changed is replaced.
+            }
             target.mkdirs();
 
             AssetExtract ae = new AssetExtract(this);
@@ -44,7 +44,9 @@ from pkg_resources import iter_entry_points
 import os, sys
 
 host_mirror = Path.home() / '.cache' / 'Cowpox' / 'mirror'
+host_cache = Path.home() / '.cache' / 'Cowpox' / 'cache'
 container_mirror = '/mirror'
+container_cache = '/cache'
 container_src = '/src'
 
 def _tzoffset():
@@ -62,13 +64,16 @@ def _imagetag():
 
 def main():
     host_mirror.mkdir(parents = True, exist_ok = True)
+    host_cache.mkdir(parents = True, exist_ok = True)
     command = [
         'docker', 'run', '--rm', '-i', *(['-t'] if sys.stdin.isatty() else []),
         '-v', f"{Path.cwd()}:{container_src}",
         '-v', f"{host_mirror}:{container_mirror}",
+        '-v', f"{host_cache}:{container_cache}",
         '-e', f"TZ=COWPOX{_tzoffset()}",
         f"combatopera/cowpox:{_imagetag()}", # TODO LATER: Unduplicate with project.arid image name.
         '--mirror', container_mirror,
+        '--cache', container_cache,
         container_src,
     ]
     os.execvp(command[0], command)
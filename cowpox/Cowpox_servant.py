@@ -40,7 +40,7 @@
 
 'Containerised component, not for direct invocation.'
 from . import APKPath, Cowpox
-from .android import AndroidProject, Assembly, AssetArchive, getbuildmode
+from .android import AndroidProject, ArchBuild, Assembly, AssetArchive, getbuildmode
 from .arch import all_archs
 from .bundle import PipInstallRecipe
 from .graph import GraphImpl
@@ -48,10 +48,14 @@ from .make import Make
 from .mirror import Mirror
 from .platform import Platform, PlatformInfo
 from .private import Private
+from .pyrecipe import CythonCache
 from .util import coalesce, Logging
+from .wheel import Wheelhouse
 from argparse import ArgumentParser
-from aridity.config import ConfigCtrl
+from aridity.config import Config, ConfigCtrl
+from concurrent.futures import ThreadPoolExecutor
 from diapyr import DI
+from functools import partial
 from lagoon import groupadd, useradd
 from pathlib import Path
 import grp, logging, os
@@ -69,6 +73,21 @@ def _inituser(srcpath):
     os.setuid(uid)
     del os.environ['HOME'] # XXX: Why is it set in the first place?
 
+def _archbuild(di, archname):
+    ctrl = (-di(Config)).childctrl()
+    ctrl.execute(f"android arch = {archname}")
+    child = DI(di) # Not entered, as the context stack is shared with other threads.
+    child.add(all_archs[archname])
+    child.add(ArchBuild)
+    child.add(ctrl.node)
+    child.add(child)
+    child.add(PipInstallRecipe)
+    child.add(Private)
+    child.add(Wheelhouse)
+    for builder in di(GraphImpl).builders:
+        child.add(builder)
+    return child(ArchBuild)
+
 def _main():
     logging = Logging()
     root = ConfigCtrl()
@@ -77,6 +96,7 @@ def _main():
     config = root.loadappconfig(Cowpox.main, 'etc/Cowpox.arid')
     parser = ArgumentParser()
     parser.add_argument('--mirror')
+    parser.add_argument('--cache')
     parser.add_argument('src')
     parser.parse_args(namespace = config.cli)
     srcpath = Path(config.container.src)
@@ -84,22 +104,25 @@ def _main():
     _inituser(srcpath)
     logging.setpath(Path(config.log.path))
     with DI() as di:
-        di.add(all_archs[config.android.arch])
         di.add(AndroidProject)
         di.add(Assembly)
         di.add(AssetArchive)
         di.add(config)
+        di.add(CythonCache)
         di.add(di)
         di.add(getbuildmode)
         di.add(GraphImpl)
         di.add(Make)
         di.add(Mirror)
-        di.add(PipInstallRecipe)
         di.add(Platform)
         di.add(PlatformInfo)
-        di.add(Private)
-        for builder in di(GraphImpl).builders:
-            di.add(builder)
+        for shared in CythonCache, GraphImpl, Make, Mirror, Platform: # Create before the arch threads can race to do it.
+            di(shared)
+        archnames = list(config.android.archs)
+        log.info("Archs: %s", ', '.join(archnames))
+        with ThreadPoolExecutor(len(archnames)) as e:
+            for archbuild in e.map(partial(_archbuild, di), archnames):
+                di.add(archbuild)
         return di(APKPath).relative_to(config.container.src)
 
 def main():
@@ -39,33 +39,39 @@
 # THE SOFTWARE.
 
 from . import AndroidProjectMemo, APKPath, Arch, JavaSrc, LibRepo, PrivateMemo, RecipeMemo
-from .make import Make
+from .archive import abiprefix, formatmanifest, GzipWriter, manifestname, repackzip, unmappablelibs
+from .cache import filedigest, KeyCache, keydigest, treedigest
+from .container import materialise
+from .filter import PathFilter
+from .make import builduuid, Make
 from .platform import Platform
 from .recipes.sqlite3 import Sqlite3Recipe
+from .stages import archstages, changedstages, stagedigests
 from .util import Contrib, writeproperties
 from aridity import Repl
 from aridity.config import Config
+from contextlib import nullcontext
 from diapyr import types
 from diapyr.util import enum
-from fnmatch import fnmatch
+from io import BytesIO
 from itertools import chain
-from lagoon import unzip
 from pathlib import Path
 from pkg_resources import resource_string
-from tempfile import TemporaryDirectory
-import logging, os, shutil, tarfile, time
+from zipfile import ZipFile
+import logging, os, shutil, tarfile
 
 log = logging.getLogger(__name__)
 
 @enum(
-    ['debug', 'assembleDebug'],
-    ['release', 'assembleRelease'],
+    ['debug', 'assembleDebug', False],
+    ['release', 'assembleRelease', True],
 )
 class Division:
 
-    def __init__(self, name, goal):
+    def __init__(self, name, goal, shrinkable):
         self.name = name
         self.goal = goal
+        self.shrinkable = shrinkable
 
 @enum(
     ['debug', Division.debug, False],
@@ -85,37 +91,108 @@ def getbuildmode(config):
 
 class Assembly:
 
-    @types(Config, BuildMode)
-    def __init__(self, config, mode):
+    signaturesuffixes = '.SF', '.RSA', '.DSA', '.EC'
+
+    @types(Config, BuildMode, Platform)
+    def __init__(self, config, mode, platform):
         self.android_project_dir = Path(config.android.project.dir)
-        self.gradleenv = dict(ANDROID_HOME = config.SDK.dir, ANDROID_NDK_HOME = config.NDK.dir)
+        self.assets_dir = Path(config.android.project.assets.dir)
+        self.gradle_userhome = Path(config.gradle.user.home)
+        self.debugkeystore = Path(config.android.sdk.home, '.android', 'debug.keystore') # Where gradle creates it.
+        self.gradleenv = dict(ANDROID_HOME = config.SDK.dir, ANDROID_NDK_HOME = config.NDK.dir, GRADLE_USER_HOME = str(self.gradle_userhome), ANDROID_SDK_HOME = config.android.sdk.home)
         self.gradle_builddir = Path(config.gradle.buildDir)
+        self.gradle_daemon = config.gradle.daemon
+        self.gradle_buildcache = config.gradle.build.cache
+        self.gradle_offline = config.gradle.offline
+        self.repack = config.apk.repack
+        self.extractnativelibs = config.android.extractNativeLibs
         self.mode = mode
+        self.platform = platform
 
     @types(Make, AndroidProjectMemo, this = APKPath)
     def build_package(self, make, projectmemo):
-        make(self.gradle_builddir, [projectmemo, self.mode.name], self._target) # XXX: Should SDK/NDK be in dependencies?
         # XXX: Can we tell gradle what to use for filename?
-        return self.gradle_builddir / 'outputs' / 'apk' / self.mode.division.name / f"{self.android_project_dir.name}-{self.mode.name}.apk"
+        apkpath = self.gradle_builddir / 'outputs' / 'apk' / self.mode.division.name / f"{self.android_project_dir.name}-{self.mode.name}.apk"
+        def update(olddependencies):
+            oldprojectmemo, oldmodename = olddependencies
+            if self.repack and oldmodename == self.mode.name and apkpath.exists() and {'assets'} == changedstages(oldprojectmemo, projectmemo):
+                self._repack(apkpath)
+            else:
+                self._target()
+        make(self.gradle_builddir, [projectmemo, self.mode.name], self._target, update = update) # XXX: Should SDK/NDK be in dependencies?
+        if not self.extractnativelibs:
+            names = unmappablelibs(apkpath)
+            if names:
+                raise Exception(f"Libs must be stored and page-aligned to be loaded from the APK: {names}")
+        return apkpath
+
+    def _issignature(self, name):
+        return name.startswith('META-INF/') and ('META-INF/MANIFEST.MF' == name or name.endswith(self.signaturesuffixes))
+
+    def _repack(self, apkpath):
+        'Replace the private data in the last APK gradle built, as nothing else has changed.'
+        log.info("Repack: %s", apkpath)
+        partpath = apkpath.with_name(f"{apkpath.name}.part")
+        repackzip(apkpath, partpath, {f"assets/{name}": self.assets_dir / name for name in ['private.mp3', 'private.version']}, lambda name: not self._issignature(name))
+        if self.mode.signing:
+            keyargs = ['--ks', os.environ['P4A_RELEASE_KEYSTORE'], '--ks-key-alias', os.environ['P4A_RELEASE_KEYALIAS'],
+                    '--ks-pass', 'env:P4A_RELEASE_KEYSTORE_PASSWD', '--key-pass', 'env:P4A_RELEASE_KEYALIAS_PASSWD']
+        elif Division.debug == self.mode.division:
+            keyargs = ['--ks', self.debugkeystore, '--ks-key-alias', 'androiddebugkey', '--ks-pass', 'pass:android', '--key-pass', 'pass:android']
+        else:
+            partpath.rename(apkpath)
+            return
+        self.platform.buildtool('apksigner')[print]('sign', *keyargs, '--out', apkpath, partpath)
+        partpath.unlink()
+        log.info('Android packaging done!')
 
     def _target(self):
         from lagoon import gradle
-        # TODO: Download gradle dependencies in advance.
-        gradle.__no_daemon[print](self.mode.division.goal, env = self.gradleenv, cwd = self.android_project_dir)
+        # Dependencies are declared in build.gradle, so once a build of it has succeeded online they are all in the user home:
+        warmpath = self.gradle_userhome / 'Cowpox-warm' / filedigest(self.android_project_dir / 'build.gradle')
+        offline = self.gradle_offline and warmpath.exists()
+        args = ['--daemon' if self.gradle_daemon else '--no-daemon']
+        if self.gradle_buildcache:
+            args.append('--build-cache')
+        if offline:
+            args.append('--offline')
+        gradle[print](*args, self.mode.division.goal, env = self.gradleenv, cwd = self.android_project_dir)
+        if not offline:
+            warmpath.pmkdirp().touch()
         log.info('Android packaging done!')
 
+class ArchBuild:
+    'Everything built for one arch that goes into the APK.'
+
+    @types(Config, Arch, [JavaSrc], [LibRepo], [RecipeMemo], PrivateMemo, Sqlite3Recipe)
+    def __init__(self, config, arch, javasrcs, librepos, recipememos, privatememo, sqlite3 = None):
+        self.private_dir = Path(config.private.dir)
+        self.arch = arch
+        self.javasrcs = javasrcs
+        self.librepos = librepos
+        # All recipes are built by now, so their memos can be looked up by type:
+        self.javasrcmemos = [builduuid(javasrc.recipebuilddir) for javasrc in javasrcs]
+        self.librepomemos = [builduuid(librepo.recipebuilddir) for librepo in librepos]
+        self.privatememo = privatememo
+        self.sqlite3 = sqlite3
+
 class AssetArchive:
 
-    @types(Config, Sqlite3Recipe)
-    def __init__(self, config, sqlite3 = None):
-        self.contribs = [
-            Contrib([Path(config.private.dir)]),
-            Contrib([Path(d, 'private') for d in chain(config.bootstrap.dirs, config.bootstrap.common.dirs)]),
-        ]
+    @types(Config, [ArchBuild])
+    def __init__(self, config, archbuilds):
+        self.privatecontribs = [[archbuild.arch.name, Contrib([archbuild.private_dir])] for archbuild in archbuilds]
+        self.bootstrapprivatedirs = [Path(d, 'private') for d in chain(config.bootstrap.dirs, config.bootstrap.common.dirs)]
+        self.bootstrapcontrib = Contrib(self.bootstrapprivatedirs)
         self.tarpath = Path(config.android.project.assets.dir, 'private.mp3')
-        self.WHITELIST_PATTERNS = ['pyconfig.h'] if config.bootstrap.name in {'sdl2', 'webview', 'service_only'} else []
-        self.WHITELIST_PATTERNS.extend(config.android.whitelist)
-        self.BLACKLIST_PATTERNS = [
+        self.versionpath = self.tarpath.with_suffix('.version')
+        self.cachepath = Path(config.private.archive.path)
+        self.digestpath = self.cachepath.with_name(f"{self.cachepath.name}.md5")
+        self.codec = config.private.archive.codec
+        self.level = config.private.archive.level
+        self.parallel = config.zip.parallel
+        whitelist = ['pyconfig.h'] if config.bootstrap.name in {'sdl2', 'webview', 'service_only'} else []
+        whitelist.extend(config.android.whitelist)
+        blacklist = [
             '^*.hg/*',
             '^*.git/*',
             '^*.bzr/*',
@@ -126,44 +203,107 @@ class AssetArchive:
             '*.py',
             '.Cowpox/*',
         ] + resource_string(__name__, 'blacklist.txt').decode().splitlines()
-        if config.bootstrap.name in {'webview', 'service_only'} or sqlite3 is None:
-            self.BLACKLIST_PATTERNS += ['sqlite3/*', 'lib-dynload/_sqlite3.so']
-
-    def _accept(self, path):
-        def match_filename(pattern_list):
-            for pattern in pattern_list:
-                if pattern.startswith('^'):
-                    pattern = pattern[1:]
-                else:
-                    pattern = '*/' + pattern
-                if fnmatch(path, pattern):
-                    return True
-        return match_filename(self.WHITELIST_PATTERNS) or not match_filename(self.BLACKLIST_PATTERNS)
+        if config.bootstrap.name in {'webview', 'service_only'} or any(archbuild.sqlite3 is None for archbuild in archbuilds):
+            blacklist += ['sqlite3/*', 'lib-dynload/_sqlite3.so']
+        self.whitelist = whitelist
+        self.blacklist = blacklist
+        self.accept = PathFilter(whitelist, blacklist)
+
+    def dependencies(self):
+        'Everything other than the private dirs that affects the archive.'
+        return [self.codec, self.level, self.whitelist, self.blacklist, [treedigest(d) for d in self.bootstrapprivatedirs]]
+
+    def _relpathtopath(self, digest):
+        'Files identical in every arch are packed once, the rest per arch under abiprefix for AssetExtract to choose from.'
+        archtrees = [[archname, {relpath: path for path, relpath in contrib.filepaths() if self.accept(path)}] for archname, contrib in self.privatecontribs]
+        relpathtopath = {}
+        for relpath in sorted(set().union(*(tree.keys() for _, tree in archtrees))):
+            paths = [tree.get(relpath) for _, tree in archtrees]
+            if None not in paths and 1 == len({digest(path) for path in paths}):
+                relpathtopath[relpath] = paths[0]
+            else:
+                for (archname, _), path in zip(archtrees, paths):
+                    if path is not None:
+                        relpathtopath[Path(abiprefix, archname, relpath)] = path
+        for path, relpath in self.bootstrapcontrib.filepaths():
+            if self.accept(path):
+                for archname, _ in archtrees:
+                    relpathtopath.pop(Path(abiprefix, archname, relpath), None)
+                relpathtopath[relpath] = path # Later wins, as it would on extraction.
+        return relpathtopath
+
+    def _compressor(self, f):
+        if 'gzip' == self.codec:
+            return GzipWriter(f, self.level, self.parallel)
+        if 'none' == self.codec: # See AssetExtract for how it is detected.
+            return nullcontext(f)
+        raise Exception(f"Unsupported codec: {self.codec}")
 
     def makeprivate(self):
+        'Also write a digest of the contents as a separate asset, for the app to tell whether it has already extracted them.'
+        digests = {}
+        def digest(path):
+            try:
+                return digests[path]
+            except KeyError:
+                digests[path] = d = filedigest(path)
+                return d
+        relpathtopath = self._relpathtopath(digest)
+        relpaths = sorted(relpathtopath)
+        relpathtodigest = {relpath: digest(relpathtopath[relpath]) for relpath in relpaths}
+        contentdigest = keydigest([[str(relpath), self._isexecutable(relpathtopath[relpath]), relpathtodigest[relpath]] for relpath in relpaths])
+        digest = keydigest([self.codec, self.level, contentdigest])
+        if self.cachepath.exists() and self.digestpath.exists() and self.digestpath.read_text() == digest:
+            log.info("[%s] Already up to date.", self.cachepath)
+        else:
+            log.info("[%s] Write %s files.", self.cachepath, len(relpaths))
+            if self.digestpath.exists():
+                self.digestpath.unlink()
+            partpath = self.cachepath.pmkdirp().with_name(f"{self.cachepath.name}.part")
+            with partpath.open('wb') as f, self._compressor(f) as g:
+                self._writetar(g, relpaths, relpathtopath, relpathtodigest)
+            partpath.rename(self.cachepath) # Never modify in place, a previous project may link to it.
+            self.digestpath.write_text(digest)
         if self.tarpath.exists():
             self.tarpath.unlink()
+        materialise({self.tarpath: self.cachepath})
+        self.versionpath.write_text(contentdigest)
+
+    @staticmethod
+    def _isexecutable(path):
+        return bool(path.stat().st_mode & 0o111)
+
+    def _writetar(self, f, relpaths, relpathtopath, relpathtodigest):
+        'Identical files give identical bytes, regardless of timestamps, owners and walk order. The manifest comes first for AssetExtract.'
         def mkdirp(relpath):
             if relpath in tardirs:
                 return
             mkdirp(relpath.parent)
             info = tarfile.TarInfo(str(relpath))
             info.type = tarfile.DIRTYPE
-            info.mode |= 0o111
+            info.mode = 0o755
             tf.addfile(info)
             tardirs.add(relpath)
-        with tarfile.open(self.tarpath.pmkdirp(), 'w:gz', format = tarfile.USTAR_FORMAT) as tf:
+        with tarfile.open(fileobj = f, mode = 'w', format = tarfile.USTAR_FORMAT) as tf:
             tardirs = {Path('.')}
-            for contrib in self.contribs:
-                for path, relpath in contrib.filepaths():
-                    if self._accept(path):
-                        mkdirp(relpath.parent)
-                        tf.add(path, relpath)
+            manifestdata = formatmanifest({str(relpath): digest for relpath, digest in relpathtodigest.items()})
+            info = tarfile.TarInfo(manifestname)
+            info.size = len(manifestdata)
+            info.mode = 0o644
+            tf.addfile(info, BytesIO(manifestdata))
+            for relpath in relpaths:
+                path = relpathtopath[relpath]
+                mkdirp(relpath.parent)
+                info = tarfile.TarInfo(str(relpath))
+                info.size = path.stat().st_size
+                info.mode = 0o755 if self._isexecutable(path) else 0o644
+                with path.open('rb') as g:
+                    tf.addfile(info, g)
 
 class AndroidProject:
 
-    @types(Config, Arch, Platform, AssetArchive, BuildMode, [JavaSrc], [LibRepo])
-    def __init__(self, config, arch, platform, assetarchive, mode, javasrcs, librepos):
+    @types(Config, Platform, AssetArchive, BuildMode, [ArchBuild])
+    def __init__(self, config, platform, assetarchive, mode, archbuilds):
         ndk_api = config.android.ndk_api
         self.min_sdk_version = config.android.minSdkVersion
         if ndk_api != self.min_sdk_version:
@@ -182,6 +322,9 @@ class AndroidProject:
         self.icon_path = config.icon.full.path
         self.presplash_path = config.presplash.full.path
         self.wakelock = config.android.wakelock
+        self.extractnativelibs = config.android.extractNativeLibs
+        self.shrink = config.shrink.enabled and mode.division.shrinkable
+        self.shrinkkeep = list(config.shrink.keep)
         self.permissions = list(config.android.permissions)
         self.android_apptheme = config.android.apptheme
         self.fullscreen = config.android.fullscreen
@@ -191,78 +334,190 @@ class AndroidProject:
         self.gradle_builddir = config.gradle.buildDir
         self.sdk_dir = config.SDK.dir
         self.aar_dir = Path(config.aar.dir)
+        self.aarcache = KeyCache(Path(config.aar.cache.dir))
         self.srccontrib = Contrib([Path(d, 'src') for d in chain(config.bootstrap.dirs, config.bootstrap.common.dirs)])
         self.templates = Contrib([Path(d, 'templates') for d in chain(config.bootstrap.dirs, config.bootstrap.common.dirs)])
-        self.arch = arch
         self.platform = platform
         self.assetarchive = assetarchive
         self.mode = mode
-        self.javasrcs = javasrcs
-        self.librepos = librepos
+        self.archbuilds = archbuilds
 
     def _numver(self):
         version_code = 0
         for i in self.version.split('.'):
             version_code *= 100
             version_code += int(i)
-        return f"{self.arch.numver}{self.min_sdk_version}{version_code}"
+        return f"{max(archbuild.arch.numver for archbuild in self.archbuilds)}{self.min_sdk_version}{version_code}"
 
-    def _distribute_aars(self):
+    def _aarpaths(self):
         log.info('Unpacking aars')
-        for aar in self.aar_dir.glob('*.aar'):
-            self._unpack_aar(aar)
+        topathtofrompath = {}
+        for aar in sorted(self.aar_dir.glob('*.aar')):
+            topathtofrompath.update(self._unpack_aar(aar))
+        return topathtofrompath
 
     def _unpack_aar(self, aar):
-        with TemporaryDirectory() as temp_dir:
-            name = os.path.splitext(aar.name)[0]
-            jar_name = f"{name}.jar"
-            log.info("unpack %s aar", name)
-            log.debug("  from %s", aar)
-            log.debug("  to %s", temp_dir)
-            unzip._o[print](aar, '-d', temp_dir)
-            jar_src = Path(temp_dir, 'classes.jar')
-            jar_tgt = self.android_project_libs.mkdirp() / jar_name
-            log.debug("copy %s jar", name)
-            log.debug("  from %s", jar_src)
-            log.debug("  to %s", jar_tgt)
-            shutil.copy2(jar_src, jar_tgt)
-            so_src_dir = Path(temp_dir, 'jni', self.arch.name)
-            so_tgt_dir = (self.android_project_libs / self.arch.name).mkdirp()
-            log.debug("copy %s .so", name)
-            log.debug("  from %s", so_src_dir)
-            log.debug("  to %s", so_tgt_dir)
-            for f in so_src_dir.glob('*.so'):
-                shutil.copy2(f, so_tgt_dir)
-
-    @types(Make, [RecipeMemo], PrivateMemo, this = AndroidProjectMemo)
-    def prepare(self, make, recipememos, privatememo):
-        return make(self.android_project_dir, [
-            self.bootstrapname,
-            self.android_api, # XXX: And sdk_dir?
-            str(self.aar_dir), # XXX: Check what's in there?
-            self.arch.name, # TODO: And most of the config.
-            recipememos,
-            privatememo,
-        ], self._prepare)
-
-    def _prepare(self):
+        'Map targets in the project to cached copies of the classes.jar and per-arch libs of the given aar.'
+        log.info("unpack %s aar", aar.stem)
+        aardigest = filedigest(aar)
+        topathtofrompath = {self.android_project_libs / f"{aar.stem}.jar": self._aarentry(aar, [aardigest], lambda name: name if 'classes.jar' == name else None) / 'classes.jar'}
+        for archbuild in self.archbuilds:
+            prefix = f"jni/{archbuild.arch.name}/"
+            entry = self._aarentry(aar, [aardigest, archbuild.arch.name], lambda name: name[len(prefix):] if name.startswith(prefix) and name.endswith('.so') and '/' not in name[len(prefix):] else None)
+            topathtofrompath.update((self.android_project_libs / archbuild.arch.name / path.name, path) for path in entry.iterdir())
+        return topathtofrompath
+
+    def _aarentry(self, aar, key, filenameornone):
+        'Cached directory of the members of the aar for which filenameornone gives a name.'
+        key = keydigest(key)
+        entry = self.aarcache.get(key)
+        if entry is None:
+            with ZipFile(aar) as zf, self.aarcache.put(key) as partialpath:
+                partialpath.mkdir()
+                for info in zf.infolist():
+                    filename = filenameornone(info.filename)
+                    if filename is not None:
+                        (partialpath / filename).write_bytes(zf.read(info))
+            entry = self.aarcache.get(key)
+        return entry
+
+    def _stages(self):
+        'Each stage writes its own part of the project, and is redone on update only if its dependencies changed.'
+        archdependencies = archstages(self.archbuilds)
+        sourcesdependencies = [
+            self.android_api,
+            str(self.sdk_dir),
+            self.webview_port,
+            *archdependencies['sources'],
+        ]
+        return [
+            ['sources', sourcesdependencies, self._sources],
+            ['libs', [
+                treedigest(self.aar_dir),
+                *archdependencies['libs'],
+            ], self._libs],
+            ['assets', [
+                *archdependencies['assets'],
+                self.assetarchive.dependencies(),
+            ], self._assets],
+            ['resources', [
+                keydigest(sourcesdependencies), # Sources include bootstrap res that may overwrite ours.
+                filedigest(Path(self.icon_path)),
+                filedigest(Path(self.presplash_path)),
+                self.app_name,
+                self.presplash_color,
+            ], self._resources],
+            ['manifest', [
+                self._numver(),
+                self.version,
+                self.min_sdk_version,
+                self.android_api,
+                self.platform.build_tools_version(),
+                self.sdl2_launchMode,
+                self.sdl2_activity_name,
+                self.orientation,
+                self.package,
+                self.permissions,
+                self.wakelock,
+                self.extractnativelibs,
+                self.shrink,
+                self.shrinkkeep,
+                self.android_apptheme,
+                self.fullscreen,
+                self.mode.name,
+                str(self.gradle_builddir),
+            ], self._manifest],
+        ]
+
+    @types(Make, this = AndroidProjectMemo)
+    def prepare(self, make):
+        stages = self._stages()
+        def install():
+            for _, _, stage in stages:
+                stage()
+        def update(olddependencies):
+            if not (isinstance(olddependencies, dict) and olddependencies['bootstrap'] == self.bootstrapname):
+                log.info("Recreate: %s", self.android_project_dir)
+                shutil.rmtree(self.android_project_dir)
+                install()
+                return
+            for name, dependencies, stage in stages:
+                if olddependencies.get(name) != dependencies:
+                    log.info("Redo stage: %s", name)
+                    stage()
+        dependencies = {name: dependencies for name, dependencies, _ in stages}
+        dependencies['bootstrap'] = self.bootstrapname
+        return dict(
+            uuid = make(self.android_project_dir, dependencies, install, update = update),
+            stages = stagedigests(dependencies), # So that the assembly can tell what changed.
+        )
+
+    def _sources(self):
+        javadir = self.android_project_dir / 'src' / 'main' / 'java'
+        if javadir.exists():
+            shutil.rmtree(javadir)
         self.srccontrib.mergeinto(self.android_project_dir / 'src')
         writeproperties(self.android_project_dir / 'project.properties', target = f"android-{self.android_api}")
         writeproperties(self.android_project_dir / 'local.properties', **{'sdk.dir': self.sdk_dir}) # Required by gradle build.
-        log.info('Copying libs.')
-        self._distribute_aars()
-        archlibs = (self.android_project_libs / self.arch.name).mkdirp()
-        for librepo in self.librepos:
-            for builtlibpath in librepo.builtlibpaths():
-                shutil.copy2(librepo.recipebuilddir / builtlibpath, archlibs)
-        for javasrc in self.javasrcs:
+        for javasrc in self.archbuilds[0].javasrcs: # Same for every arch.
             contrib = javasrc.javasrc()
             log.info("Copying java files from: %s", contrib)
-            contrib.mergeinto(self.android_project_dir / 'src' / 'main' / 'java')
+            contrib.mergeinto(javadir)
+        if self.bootstrapname == 'webview':
+            with Repl() as repl:
+                repl.printf("port = %s", self.webview_port)
+                repl.printf("redirect %s", (javadir / 'org' / 'kivy' / 'android').mkdirp() / 'WebViewLoader.java')
+                repl.printf("< %s", self.templates.resolve('WebViewLoader.java.aridt'))
+
+    def _libs(self):
+        log.info('Copying libs.')
+        if self.android_project_libs.exists():
+            shutil.rmtree(self.android_project_libs)
+        topathtofrompath = self._aarpaths()
+        for archbuild in self.archbuilds:
+            archlibs = (self.android_project_libs / archbuild.arch.name).mkdirp()
+            for librepo in archbuild.librepos:
+                for builtlibpath in librepo.builtlibpaths():
+                    topathtofrompath[archlibs / Path(builtlibpath).name] = librepo.recipebuilddir / builtlibpath # Wins over any aar lib of the same name.
+        materialise(topathtofrompath)
+
+    def _assets(self):
         self.assetarchive.makeprivate()
+
+    def _resources(self):
         shutil.copy2(self.icon_path, (self.res_dir / 'drawable').mkdirp() / 'icon.png')
         if self.bootstrapname != 'service_only':
             shutil.copy2(self.presplash_path, self.res_dir / 'drawable' / 'presplash.jpg')
+        with Repl() as repl:
+            repl('& = $(xmltext)')
+            repl.printf("app_name = %s", self.app_name)
+            repl.printf("presplash_color = %s", self.presplash_color)
+            repl('urlScheme = kivy')
+            repl.printf("redirect %s", (self.res_dir / 'values').mkdirp() / 'strings.xml')
+            repl.printf("< %s", self.templates.resolve('strings.xml.aridt'))
+
+    def _shrinkpaths(self):
+        return self.android_project_dir / 'proguard-rules.pro', self.res_dir / 'raw' / 'cowpox_keep.xml'
+
+    def _writeshrinkrules(self):
+        'Keep what native code and pyjnius look up by name, and resources looked up by name via ResourceManager.'
+        rulespath, keeppath = self._shrinkpaths()
+        with rulespath.open('w') as f:
+            print('-dontobfuscate', file = f)
+            for classfilter in [*self.shrinkkeep, f"{self.package}.**"]:
+                print(f"-keep class {classfilter} {{ *; }}", file = f)
+        keeppath.pmkdirp().write_text('''<?xml version="1.0" encoding="utf-8"?>
+<resources xmlns:tools="http://schemas.android.com/tools" tools:keep="@drawable/presplash,@string/*" />
+''')
+        return rulespath.name
+
+    def _removeshrinkrules(self):
+        for path in self._shrinkpaths():
+            if path.exists():
+                log.info("Delete: %s", path)
+                path.unlink()
+
+    def _manifest(self):
         numeric_version = self._numver()
         configChanges = ['keyboardHidden', 'orientation']
         if self.bootstrapname != 'service_only':
@@ -297,6 +552,7 @@ class AndroidProject:
                 repl('permissions += android.permission.WAKE_LOCK')
             repl.printf("theme = %s", f"{self.android_apptheme}{'.Fullscreen' if self.fullscreen else ''}")
             repl.printf("wakelock = %s", int(self.wakelock))
+            repl.printf("extractNativeLibs = %s", 'true' if self.extractnativelibs else 'false')
             repl.printf("targetSdkVersion = %s", self.android_api)
             repl.printf("configChanges = %s", '|'.join(configChanges))
             repl.printf("redirect %s", self.android_project_dir / 'src' / 'main' / 'AndroidManifest.xml')
@@ -316,18 +572,11 @@ class AndroidProject:
                 repl.printf("storePassword = %s", os.environ['P4A_RELEASE_KEYSTORE_PASSWD'])
                 repl.printf("keyPassword = %s", os.environ['P4A_RELEASE_KEYALIAS_PASSWD'])
             repl.printf("buildDir = %s", self.gradle_builddir)
+            if not self.extractnativelibs:
+                repl('noCompress = so') # Stored libs are page-aligned by the packager.
+            if self.shrink:
+                repl.printf("proguardRules = %s", self._writeshrinkrules())
+            else:
+                self._removeshrinkrules()
             repl.printf("redirect %s", self.android_project_dir / 'build.gradle')
             repl.printf("< %s", self.templates.resolve('build.gradle.aridt'))
-        with Repl() as repl:
-            repl('& = $(xmltext)')
-            repl.printf("app_name = %s", self.app_name)
-            repl.printf("private_version = %s", time.time()) # XXX: Must we use time?
-            repl.printf("presplash_color = %s", self.presplash_color)
-            repl('urlScheme = kivy')
-            repl.printf("redirect %s", (self.res_dir / 'values').mkdirp() / 'strings.xml')
-            repl.printf("< %s", self.templates.resolve('strings.xml.aridt'))
-        if self.bootstrapname == 'webview':
-            with Repl() as repl:
-                repl.printf("port = %s", self.webview_port)
-                repl.printf("redirect %s", (self.android_project_dir / 'src' / 'main' / 'java' / 'org' / 'kivy' / 'android').mkdirp() / 'WebViewLoader.java')
-                repl.printf("< %s", self.templates.resolve('WebViewLoader.java.aridt'))
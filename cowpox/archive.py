@@ -0,0 +1,296 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from .cache import filedigest, keydigest
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
+from zipfile import BadZipFile, ZipFile
+import logging, shutil, struct, zlib
+
+log = logging.getLogger(__name__)
+manifestname = '.Cowpox-manifest'
+abiprefix = '.Cowpox-abi' # Members under abiprefix/<abi>/ are extracted as if at top level, but only for that abi.
+dostime = 0 # Midnight.
+dosdate = 1 << 5 | 1 # 1980-01-01, the earliest zip can represent.
+filemode = 0o100644
+stored = 0
+deflated = 8
+
+class ZipMember:
+
+    def __init__(self, arcname, path, compress):
+        data = path.read_bytes()
+        self.name = arcname.encode()
+        self.crc = zlib.crc32(data)
+        self.size = len(data)
+        if compress:
+            c = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+            self.data = c.compress(data) + c.flush()
+            self.method = deflated
+        else:
+            self.data = data
+            self.method = stored
+        self.flags = 0 if self.name.isascii() else 0x800
+
+    @classmethod
+    def fromzip(cls, f, info):
+        'Member of an existing zip, without recompressing it.'
+        self = cls.__new__(cls)
+        f.seek(info.header_offset)
+        namelen, extralen = struct.unpack('<26xHH', f.read(30))
+        f.seek(namelen + extralen, 1)
+        self.name = info.orig_filename.encode('utf-8' if info.flag_bits & 0x800 else 'cp437')
+        self.crc = info.CRC
+        self.size = info.file_size
+        self.data = f.read(info.compress_size)
+        self.method = info.compress_type
+        self.flags = info.flag_bits & 0x800
+        return self
+
+    def _common(self):
+        return struct.pack('<HHHHHIIIH', 20, self.flags, self.method, dostime, dosdate, self.crc, len(self.data), self.size, len(self.name))
+
+    def localheader(self, padding = 0):
+        return b'PK\3\4' + self._common() + struct.pack('<H', padding) + self.name + bytes(padding)
+
+    def centralheader(self, offset):
+        return b'PK\1\2' + struct.pack('<H', 3 << 8 | 20) + self._common() + struct.pack('<HHHHII', 0, 0, 0, 0, filemode << 16, offset) + self.name
+
+def writezip(zippath, arcnametopath, compress = True, parallel = False):
+    '''Write a zip with members in name order and fixed timestamps, so that it depends only on content.
+    Members are compressed in parallel if requested, and nothing is written if the existing zip has the same content.'''
+    arcnames = sorted(arcnametopath)
+    digest = keydigest([compress, [[arcname, filedigest(arcnametopath[arcname])] for arcname in arcnames]]).encode()
+    try:
+        with ZipFile(zippath) as zf:
+            if zf.comment == digest:
+                log.info("[%s] Already up to date.", zippath)
+                return
+    except (FileNotFoundError, BadZipFile):
+        pass
+    log.info("[%s] Write %s members.", zippath, len(arcnames))
+    with ThreadPoolExecutor(cpu_count() if parallel else 1) as executor, zippath.open('wb') as f:
+        _writemembers(f, executor.map(lambda arcname: ZipMember(arcname, arcnametopath[arcname], compress), arcnames), digest)
+
+def zipbytecode(dirpath, zippath, compress = True, parallel = False):
+    'Move top-level packages and modules that are nothing but bytecode (and sources, which are not shipped) into a zip for zipimport.'
+    arcnametopath = {}
+    movedpaths = []
+    for path in sorted(dirpath.iterdir()):
+        if path.is_dir():
+            filepaths = [p for p in path.rglob('*') if p.is_file()]
+            if (path / '__init__.pyc').exists() and all(p.suffix in {'.py', '.pyc'} for p in filepaths):
+                arcnametopath.update((str(p.relative_to(dirpath)), p) for p in filepaths if '.pyc' == p.suffix)
+                movedpaths.append(path)
+        elif '.pyc' == path.suffix:
+            arcnametopath[path.name] = path
+            movedpaths.extend(p for p in [path, path.with_suffix('.py')] if p.exists())
+    writezip(zippath, arcnametopath, compress, parallel)
+    for path in movedpaths:
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+
+def _alignment(member):
+    'As zipalign -p, stored data is aligned for mmap and libs to the page.'
+    if stored == member.method:
+        return 4096 if member.name.endswith(b'.so') else 4
+
+def _writemembers(f, members, comment = b'', align = False):
+    central = []
+    for member in members:
+        offset = f.tell()
+        padding = 0
+        if align:
+            alignment = _alignment(member)
+            if alignment is not None:
+                padding = -(offset + 30 + len(member.name)) % alignment
+        central.append(member.centralheader(offset))
+        f.write(member.localheader(padding))
+        f.write(member.data)
+    offset = f.tell()
+    for header in central:
+        f.write(header)
+    f.write(b'PK\5\6' + struct.pack('<HHHHIIH', 0, 0, len(central), len(central), f.tell() - offset, offset, len(comment)) + comment)
+
+def unmappablelibs(zippath):
+    'Names of libs that cannot be loaded directly from the zip, as they are compressed or not page-aligned.'
+    names = []
+    with ZipFile(zippath) as zf, zippath.open('rb') as f:
+        for info in zf.infolist():
+            if info.filename.endswith('.so'):
+                f.seek(info.header_offset)
+                namelen, extralen = struct.unpack('<26xHH', f.read(30))
+                if stored != info.compress_type or (info.header_offset + 30 + namelen + extralen) % 4096:
+                    names.append(info.filename)
+    return names
+
+def repackzip(srcpath, dstpath, arcnametopath, keep):
+    '''Copy the zip without recompressing anything, replacing or adding the given members as stored and omitting those keep rejects.
+    The result is aligned as by zipalign -p.'''
+    with ZipFile(srcpath) as zf, srcpath.open('rb') as f:
+        members = [ZipMember(info.filename, arcnametopath[info.filename], False) if info.filename in arcnametopath else ZipMember.fromzip(f, info)
+                for info in zf.infolist() if keep(info.filename)]
+        names = set(zf.namelist())
+    members.extend(ZipMember(arcname, path, False) for arcname, path in arcnametopath.items() if arcname not in names)
+    with dstpath.open('wb') as f:
+        _writemembers(f, members, align = True)
+
+def _deflate(block, zdict, level, final):
+    c = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, **(dict(zdict = zdict) if zdict else {}))
+    return c.compress(block) + c.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class GzipWriter:
+    '''Write-only gzip stream as a single member, so that any gzip reader can read it.
+    Blocks are deflated concurrently if requested, each primed with the tail of the previous one, and the output does not depend on parallelism.'''
+
+    blocksize = 1 << 20
+    windowsize = 1 << 15
+
+    def __init__(self, f, level = zlib.Z_DEFAULT_COMPRESSION, parallel = False):
+        self.f = f
+        self.level = level
+        self.workers = cpu_count() if parallel else 1
+        self.executor = ThreadPoolExecutor(self.workers)
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.zdict = b''
+        self.crc = 0
+        self.size = 0
+        f.write(b'\x1f\x8b\x08\x00' + struct.pack('<I', 0) + b'\x00\xff') # No name and no mtime, OS unknown.
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def tell(self):
+        return self.size
+
+    def write(self, data):
+        self.buffer += data
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        while len(self.buffer) >= self.blocksize:
+            self._submit(bytes(self.buffer[:self.blocksize]), False)
+            del self.buffer[:self.blocksize]
+        return len(data)
+
+    def _submit(self, block, final):
+        self.pending.append(self.executor.submit(_deflate, block, self.zdict, self.level, final))
+        self.zdict = block[-self.windowsize:]
+        while len(self.pending) > self.workers * 2:
+            self.f.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.executor is None:
+            return
+        self._submit(bytes(self.buffer), True)
+        while self.pending:
+            self.f.write(self.pending.popleft().result())
+        self.f.write(struct.pack('<II', self.crc, self.size & 0xffffffff))
+        self.executor.shutdown()
+        self.executor = None
+
+def formatmanifest(relpathtodigest):
+    return ''.join(f"{relpathtodigest[relpath]} {relpath}\n" for relpath in sorted(relpathtodigest)).encode()
+
+def parsemanifest(data):
+    relpathtodigest = {}
+    for line in data.decode().splitlines():
+        digest, space, relpath = line.partition(' ')
+        if space:
+            relpathtodigest[relpath] = digest
+    return relpathtodigest
+
+def _abiname(name, abi):
+    'Where to extract the given member, or None to skip it.'
+    parts = name.split('/')
+    if abiprefix != parts[0]:
+        return name
+    if len(parts) > 2 and abi == parts[1]:
+        return '/'.join(parts[2:])
+
+def extractdelta(tf, targetdir, abis = ()):
+    '''Reference implementation of AssetExtract.extractTar, which only writes members whose digest differs from the previous extraction.
+    Of the given abis in order of preference, the first with members in the archive is used.
+    The caller empties targetdir first if it has no manifest. Return the names written and deleted.'''
+    manifestpath = targetdir / manifestname
+    oldmanifest = {}
+    if manifestpath.exists():
+        oldmanifest = parsemanifest(manifestpath.read_bytes())
+        manifestpath.unlink() # An interrupted extraction must not be trusted next time.
+    newmanifest = abi = None
+    written = []
+    for info in tf:
+        if manifestname == info.name:
+            archivemanifest = parsemanifest(tf.extractfile(info).read())
+            available = {name.split('/')[1] for name in archivemanifest if name.startswith(f"{abiprefix}/")}
+            if available:
+                abi = next((a for a in abis if a in available), None)
+                if abi is None:
+                    raise Exception(f"No supported abi in: {', '.join(sorted(available))}")
+            newmanifest = {name: digest for n, digest in archivemanifest.items() for name in [_abiname(n, abi)] if name is not None}
+            continue
+        name = _abiname(info.name, abi)
+        if name is None:
+            continue
+        path = targetdir / name
+        if info.isdir():
+            path.mkdir(parents = True, exist_ok = True)
+            continue
+        if newmanifest is not None:
+            digest = newmanifest.get(name)
+            if digest is not None and digest == oldmanifest.get(name) and path.is_file() and path.stat().st_size == info.size:
+                continue
+        with tf.extractfile(info) as f:
+            path.write_bytes(f.read())
+        written.append(name)
+    deleted = []
+    if newmanifest is not None:
+        for relpath in oldmanifest:
+            if relpath not in newmanifest:
+                (targetdir / relpath).unlink(missing_ok = True)
+                deleted.append(relpath)
+        manifestpath.write_bytes(formatmanifest(newmanifest))
+    return written, deleted
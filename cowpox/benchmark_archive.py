@@ -0,0 +1,79 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'Compare the private archive codecs and levels on a tree, by default the stdlib, run with: python -m cowpox.benchmark_archive [DIR]'
+from .archive import GzipWriter
+from argparse import ArgumentParser
+from io import BytesIO
+from pathlib import Path
+import gzip, sysconfig, tarfile, time
+
+def _tar(root):
+    'Uncompressed tar of the tree, as AssetArchive would pass to the codec.'
+    f = BytesIO()
+    with tarfile.open(fileobj = f, mode = 'w', format = tarfile.USTAR_FORMAT) as tf:
+        for path in sorted(root.rglob('*')):
+            if path.is_file() and not path.is_symlink() and '__pycache__' not in path.parts:
+                tf.add(path, str(path.relative_to(root)))
+    return f.getvalue()
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('root', nargs = '?', type = Path, default = Path(sysconfig.get_paths()['stdlib']))
+    args = parser.parse_args()
+    data = _tar(args.root)
+    print(f"{args.root}: tar {len(data)} bytes")
+    print(f"{'codec':<6} {'level':>5} {'parallel':>8} {'bytes':>10} {'ratio':>6} {'write':>7} {'read':>7}")
+    print(f"{'none':<6} {'':>5} {'':>8} {len(data):>10} {1:>6.3f} {0:>6.3f}s {0:>6.3f}s")
+    for level in 1, 6, 9:
+        for parallel in False, True:
+            f = BytesIO()
+            start = time.perf_counter()
+            with GzipWriter(f, level, parallel) as g:
+                g.write(data)
+            writetime = time.perf_counter() - start
+            start = time.perf_counter()
+            assert gzip.decompress(f.getvalue()) == data
+            readtime = time.perf_counter() - start
+            size = len(f.getvalue())
+            print(f"{'gzip':<6} {level:>5} {str(parallel):>8} {size:>10} {size / len(data):>6.3f} {writetime:>6.3f}s {readtime:>6.3f}s")
+
+if '__main__' == __name__:
+    main()
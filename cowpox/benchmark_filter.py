@@ -0,0 +1,70 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+'Compare PathFilter with the fnmatch loop it replaces, run with: python -m cowpox.benchmark_filter'
+from .filter import PathFilter, referenceaccept
+from pkg_resources import resource_string
+import random, time
+
+samplewhitelist = ['pyconfig.h']
+sampleblacklist = ['^*.hg/*', '^*.git/*', '~', '*.bak', '*.py', '.Cowpox/*', *resource_string(__name__, 'blacklist.txt').decode().splitlines()]
+
+def samplepaths(n):
+    r = random.Random(0)
+    dirs = ['_python_bundle/site-packages/kivy/core/video', 'kivy/tests', '_python_bundle/modules', 'stdlib/encodings', 'numpy/core', 'app/data', '.git/objects', 'kivy/input/providers', 'x/.Cowpox/OK']
+    names = ['video_pyglet', 'f', 'cp1252', 'mtdev', 'camera_videocapture', 'pyconfig', '_sqlite3', 'a~']
+    exts = ['pyc', 'py', 'so', 'txt', 'h', 'pxi', 'bak', 'pyo']
+    return [f"/workspace/build/private/{r.choice(dirs)}/{r.choice(names)}{i % 7}.{r.choice(exts)}" for i in range(n)]
+
+def main():
+    paths = samplepaths(100000)
+    f = PathFilter(samplewhitelist, sampleblacklist)
+    start = time.perf_counter()
+    for p in paths:
+        f(p)
+    compiledtime = time.perf_counter() - start
+    start = time.perf_counter()
+    for p in paths:
+        referenceaccept(samplewhitelist, sampleblacklist, p)
+    referencetime = time.perf_counter() - start
+    print(f"{len(paths)} paths: compiled {compiledtime:.3f}s, reference {referencetime:.3f}s, speedup {referencetime / compiledtime:.1f}x")
+
+if '__main__' == __name__:
+    main()
@@ -39,26 +39,97 @@
 # THE SOFTWARE.
 
 from . import Graph, PipInstallMemo
-from .container import compileall
 from .make import Make
 from .pyrecipe import CythonRecipe
+from aridity.config import Config
 from diapyr import types
 from lagoon import pip
-import logging
+from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Lock
+import logging, shutil
 
 log = logging.getLogger(__name__)
 
 class PipInstallRecipe(CythonRecipe):
 
     name = 'Cowpox-bundle'
+    pinlock = Lock() # The arch builds share the lockfile.
+
+    @types(Config)
+    def __init(self, config):
+        self.lockpath = Path(config.pip.lockfile)
+        pipwheels = Path(config.pip.wheelhouse)
+        self.anywheels = pipwheels / 'any'
+        self.archwheels = pipwheels / self.arch.builddirname()
+
+    def _wheelpath(self, normname, version):
+        for wheelsdir in self.anywheels, self.archwheels:
+            if wheelsdir.exists():
+                for path in wheelsdir.glob('*.whl'):
+                    name, v = path.name.split('-')[:2]
+                    if canonicalize_name(name) == normname and v == version:
+                        return path
+
+    def _readlock(self):
+        lock = {}
+        if self.lockpath.exists():
+            for line in self.lockpath.read_text().splitlines():
+                line = line.split('#')[0].strip()
+                if line:
+                    r = Requirement(line)
+                    lock[canonicalize_name(r.name)] = next(iter(r.specifier)).version
+        return lock
+
+    def _fetch(self, requirement, env):
+        'Download or build a wheel into the wheelhouse, and return its version.'
+        log.info("Fetch wheel: %s", requirement)
+        with TemporaryDirectory() as tempdir:
+            pip.wheel._v.__no_deps[print]('--wheel-dir', tempdir, *(f"--find-links={d}" for d in [self.anywheels, self.archwheels] if d.exists()), requirement, env = env)
+            path, = Path(tempdir).glob('*.whl')
+            wheelsdir = self.anywheels if path.name.endswith('-none-any.whl') else self.archwheels
+            if not (wheelsdir / path.name).exists():
+                shutil.copy2(path, wheelsdir.mkdirp())
+            return path.name.split('-')[1]
+
+    def _pin(self, requires, env):
+        with self.pinlock:
+            return self._pinimpl(requires, env)
+
+    def _pinimpl(self, requires, env):
+        lock = self._readlock()
+        pins = []
+        for requirement in map(Requirement, requires):
+            normname = canonicalize_name(requirement.name)
+            version = lock.get(normname)
+            if version is None or not requirement.specifier.contains(version, prereleases = True):
+                version = self._fetch(str(requirement), env)
+            elif self._wheelpath(normname, version) is None:
+                self._fetch(f"{requirement.name}=={version}", env)
+            pins.append([normname, self._pinned(requirement, version)])
+        pins.sort()
+        text = ''.join(f"{line}\n" for line in ['# Generated by Cowpox, commit this file for reproducible builds.', *(pin for _, pin in pins)])
+        if not self.lockpath.exists() or self.lockpath.read_text() != text:
+            self.lockpath.write_text(text)
+        return [pin for _, pin in pins]
+
+    @staticmethod
+    def _pinned(requirement, version):
+        'Same requirement with its specifier replaced by the given version, keeping any extras and marker.'
+        extras = f"[{','.join(sorted(requirement.extras))}]" if requirement.extras else ''
+        marker = '' if requirement.marker is None else f"; {requirement.marker}"
+        return f"{requirement.name}{extras}=={version}{marker}"
 
     @types(Make, Graph, this = PipInstallMemo)
     def buildsite(self, make, graph):
         def target():
-            if pypinames:
-                pip.install._v.__no_deps[print]('--target', self.bundlepackages, *pypinames, env = self.get_recipe_env())
-                compileall(self.bundlepackages)
+            if pins:
+                pip.install._v.__no_deps.__no_index[print]('--target', self.bundlepackages,
+                        *(f"--find-links={d}" for d in [self.anywheels, self.archwheels] if d.exists()), *pins, env = env)
             else:
                 self.bundlepackages.mkdirp()
-        pypinames = graph.pypinames
-        return make(self.recipebuilddir, pypinames, target)
+        env = self.get_recipe_env()
+        pins = self._pin(graph.pypirequires, env) if graph.pypirequires else []
+        return make(self.recipebuilddir, pins, target)
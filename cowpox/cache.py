@@ -0,0 +1,90 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from contextlib import contextmanager
+from hashlib import md5
+from lagoon.util import atomic
+import json, logging
+
+log = logging.getLogger(__name__)
+chunksize = 0x10000
+
+def filedigest(path):
+    h = md5()
+    with path.open('rb') as f:
+        while True:
+            data = f.read(chunksize)
+            if not data:
+                break
+            h.update(data)
+    return h.hexdigest()
+
+def keydigest(obj):
+    'Digest of any JSON-serialisable object, consistent with how Make records dependencies.'
+    return md5(json.dumps(obj, sort_keys = True).encode()).hexdigest()
+
+def treedigest(root):
+    return keydigest([[str(path.relative_to(root)), filedigest(path)] for path in sorted(root.rglob('*')) if path.is_file()])
+
+class KeyCache:
+    'Directory of entries that never change once written, shared across builds.'
+
+    def __init__(self, root):
+        self.root = root
+
+    def get(self, key):
+        path = self.root / key
+        if path.exists():
+            return path
+
+    @contextmanager
+    def put(self, key):
+        path = self.root / key
+        written = False
+        try:
+            with atomic(path) as partialpath:
+                yield partialpath
+                written = True
+        except OSError:
+            if not (written and path.exists()):
+                raise
+            log.debug("Already cached by another build: %s", path)
+        else:
+            log.debug("Cached: %s", path)
@@ -38,10 +38,74 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-from lagoon import python
-import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from importlib.util import MAGIC_NUMBER, source_hash
+from itertools import repeat
+from multiprocessing import cpu_count, get_context
+from py_compile import PycInvalidationMode, PyCompileError
+import fcntl, logging, os, py_compile, shutil
 
-def compileall(dirpath, check = True):
-    for path in dirpath.rglob('*.py'):
-        os.utime(path, (0, 0)) # Determinism.
-    python._OO._m.compileall._b._f[print](dirpath, check = check)
+log = logging.getLogger(__name__)
+FICLONE = 0x40049409
+# Hash-based for determinism without touching mtimes:
+checkedmode = PycInvalidationMode.CHECKED_HASH, 0b11
+uncheckedmode = PycInvalidationMode.UNCHECKED_HASH, 0b01
+
+def _pycpath(path):
+    return path.with_name(f"{path.name}c") # Legacy location, as we do not ship sources.
+
+def _isuptodate(path, flags):
+    try:
+        with _pycpath(path).open('rb') as f:
+            header = f.read(16)
+    except FileNotFoundError:
+        return False
+    return header[:4] == MAGIC_NUMBER and int.from_bytes(header[4:8], 'little') == flags and header[8:] == source_hash(path.read_bytes())
+
+def _compile(path, invalidationmode):
+    try:
+        py_compile.compile(path, _pycpath(path), doraise = True, optimize = 2, invalidation_mode = invalidationmode)
+    except PyCompileError as e:
+        return e.msg
+
+def _reflink(frompath, topath):
+    with frompath.open('rb') as f, topath.open('wb') as g:
+        fcntl.ioctl(g.fileno(), FICLONE, f.fileno())
+    shutil.copystat(frompath, topath)
+
+def _materialise(topath, frompath):
+    try:
+        os.link(frompath, topath)
+        return 'hardlink'
+    except OSError:
+        pass
+    try:
+        _reflink(frompath, topath)
+        return 'reflink'
+    except OSError:
+        pass
+    shutil.copy2(frompath, topath)
+    return 'copy'
+
+def materialise(topathtofrompath):
+    'Create each target as a hardlink, reflink or copy of its source, in that order of preference. Nothing may modify a target in place.'
+    for dirpath in {topath.parent for topath in topathtofrompath}:
+        dirpath.mkdirp()
+    with ThreadPoolExecutor(cpu_count()) as executor:
+        counts = Counter(executor.map(_materialise, topathtofrompath.keys(), topathtofrompath.values()))
+    log.info("Materialised: %s", ', '.join(f"{n} {how}" for how, n in sorted(counts.items())) or 0)
+
+def compileall(dirpath, check = True, unchecked = False):
+    'With unchecked the runtime never validates a pyc against its source, if any.'
+    invalidationmode, flags = uncheckedmode if unchecked else checkedmode
+    paths = [p for p in sorted(dirpath.rglob('*.py')) if not _isuptodate(p, flags)]
+    log.info("[%s] Compile %s files.", dirpath, len(paths))
+    if not paths:
+        return
+    with ProcessPoolExecutor(cpu_count(), mp_context = get_context('spawn')) as executor: # Forking from the arch threads is unsafe.
+        errors = [e for e in executor.map(_compile, paths, repeat(invalidationmode), chunksize = 64) if e is not None]
+    for e in errors:
+        (log.error if check else log.warning)("%s", e)
+    if errors and check:
+        raise Exception(f"Failed to compile {len(errors)} files in: {dirpath}")
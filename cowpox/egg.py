@@ -38,27 +38,93 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+from .cache import filedigest, keydigest
 from aridity.model import Resolved, Text
+from configparser import ConfigParser
 from lagoon import python
+from lagoon.util import atomic
 from pathlib import Path
 from tempfile import TemporaryDirectory
+import ast, json, logging
+
+log = logging.getLogger(__name__)
+
+def _loadtoml(path):
+    try:
+        from tomllib import loads
+    except ImportError:
+        try:
+            from tomli import loads
+        except ImportError:
+            return
+    return loads(path.read_text())
+
+def _listvalue(text):
+    'Same splitting as setuptools for install_requires.'
+    text = text.strip()
+    return [r for r in (s.strip() for s in (text.splitlines() if '\n' in text else text.split(';'))) if r]
 
 class EggInfoRequires(Resolved):
 
+    metadatanames = 'setup.py', 'setup.cfg', 'pyproject.toml'
+
     @classmethod
-    def factory(cls, scope, pathresolvable):
+    def factory(cls, scope, pathresolvable, cachedirresolvable):
         v = scope.createchild(islist = True)
-        v['requires',] = cls(pathresolvable.resolve(scope).cat())
+        v['requires',] = cls(pathresolvable.resolve(scope).cat(), cachedirresolvable.resolve(scope).cat())
         return v
 
-    def __init__(self, path):
+    def __init__(self, path, cachedir):
         self.path = path
+        self.cachedir = Path(cachedir)
 
     def spread(self, _):
+        for r in self._requires():
+            yield r, Text(r)
+
+    def _requires(self):
+        cachepath = self.cachedir / f"""{keydigest([[name, filedigest(p) if p.exists() else None] for name in self.metadatanames for p in [Path(self.path, name)]])}.json"""
+        if cachepath.exists():
+            log.debug("Cached requires: %s", cachepath)
+            with cachepath.open() as f:
+                return json.load(f)
+        requires = self._staticrequires()
+        if requires is None:
+            return self._egginforequires() # Not cached as it may read any other file in the project.
+        with atomic(cachepath) as partialpath, partialpath.open('w') as f:
+            json.dump(requires, f)
+        return requires
+
+    def _staticrequires(self):
+        setuppy, setupcfg, pyprojecttoml = (Path(self.path, name) for name in self.metadatanames)
+        if not any(p.exists() for p in [setuppy, setupcfg, pyprojecttoml]):
+            return
+        if setuppy.exists():
+            for node in ast.walk(ast.parse(setuppy.read_bytes())):
+                if isinstance(node, ast.Call) and any(k.arg in {None, 'install_requires'} for k in node.keywords):
+                    return # Keyword is dynamic or could be.
+        if pyprojecttoml.exists():
+            data = _loadtoml(pyprojecttoml)
+            if data is None:
+                return
+            project = data.get('project')
+            if project is not None:
+                if 'dependencies' in project.get('dynamic', []):
+                    return
+                return list(project.get('dependencies', []))
+        if setupcfg.exists():
+            parser = ConfigParser()
+            parser.read(setupcfg)
+            value = parser.get('options', 'install_requires', fallback = '')
+            if value.strip().startswith(('file:', 'attr:')):
+                return
+            return _listvalue(value)
+        return []
+
+    def _egginforequires(self):
         with TemporaryDirectory() as tempdir:
             # FIXME: This will fail if there are any exotic imports.
             # FIXME: This invokes cythonize, but we should not write to mounted source.
             python[print]('setup.py', 'egg_info', '-e', tempdir, cwd = self.path)
             egginfodir, = Path(tempdir).glob('*.egg-info')
-            for r in (egginfodir / 'requires.txt').read_text().splitlines():
-                yield r, Text(r)
+            return (egginfodir / 'requires.txt').read_text().splitlines()
@@ -0,0 +1,97 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from fnmatch import fnmatch, translate
+import re
+
+def compilepatterns(patterns):
+    'Single regex that matches exactly what fnmatch would match with any of the given patterns.'
+    return re.compile(_alternation(patterns))
+
+def _alternation(patterns):
+    'Regex for the given fnmatch patterns as a trie of their literal prefixes, so that each character is tried once.'
+    trie = {}
+    for pattern in patterns:
+        i = min((i for i in map(pattern.find, '*?[') if i >= 0), default = len(pattern))
+        node = trie
+        for c in pattern[:i]:
+            node = node.setdefault(c, {})
+        node.setdefault('', []).append(pattern[i:])
+    def regex(node):
+        alternatives = [re.escape(c) + regex(node[c]) for c in sorted(node) if c]
+        alternatives.extend(map(translate, node.get('', [])))
+        return alternatives[0] if 1 == len(alternatives) else f"(?:{'|'.join(alternatives)})"
+    return regex(trie) if trie else '(?!)'
+
+class PathFilter:
+    '''Accept a path if it matches the whitelist or does not match the blacklist.
+    Patterns starting with ^ must match the whole path, others whatever follows any slash.'''
+
+    def __init__(self, whitelist, blacklist):
+        self.whitelist, self.blacklist = map(self._compile, [whitelist, blacklist])
+
+    @staticmethod
+    def _compile(patterns):
+        anchored = [p[1:] for p in patterns if p.startswith('^')]
+        unanchored = [p for p in patterns if not p.startswith('^')]
+        # A leading star absorbs any prefix, so such patterns need only be tried from one place each:
+        groups = [
+            ['\\A', [p for p in anchored if not p.startswith('*')]],
+            ['', [p[1:] for p in anchored if p.startswith('*')]],
+            ['\\A[^/]*/.*', [p[1:] for p in unanchored if p.startswith('*')]],
+            ['/', [p for p in unanchored if not p.startswith('*')]],
+        ]
+        return [re.compile(prefix + _alternation(g)).search for prefix, g in groups if g]
+
+    def __call__(self, path):
+        path = str(path)
+        return any(search(path) for search in self.whitelist) or not any(search(path) for search in self.blacklist)
+
+def referenceaccept(whitelist, blacklist, path):
+    'Reference implementation of PathFilter, the per-pattern fnmatch loop it replaces.'
+    def match_filename(pattern_list):
+        for pattern in pattern_list:
+            if pattern.startswith('^'):
+                pattern = pattern[1:]
+            else:
+                pattern = '*/' + pattern
+            if fnmatch(path, pattern):
+                return True
+    return match_filename(whitelist) or not match_filename(blacklist)
@@ -39,15 +39,14 @@
 # THE SOFTWARE.
 
 from . import Graph, PipInstallMemo, RecipeMemo
+from .index import RecipeImpls
 from .make import Make
 from .recipe import Recipe
-from .util import findimpls
 from aridity.config import Config
 from diapyr import types
-from importlib import import_module
 from packaging.utils import canonicalize_name
+from pathlib import Path
 from pkg_resources import parse_requirements
-from pkgutil import iter_modules
 from types import SimpleNamespace
 import logging
 
@@ -71,25 +70,27 @@ class RecipeInfo:
         for normdepend in self.depends:
             yield implmemotypes.get(normdepend, PipInstallMemo)
 
-def _namesonly(requires):
-    for r in parse_requirements(requires):
-        yield r.name
+    def dependarchindependent(self, recipeinfos):
+        for group in self.groups:
+            yield False
+        for normdepend in self.depends:
+            yield normdepend in recipeinfos and recipeinfos[normdepend].impl.archindependent
+
+def _requirements(requires):
+    return {canonicalize_name(r.name): r for r in parse_requirements(requires)}
 
 class GraphImpl(Graph):
 
     @types(Config)
     def __init__(self, config):
-        allimpls = {canonicalize_name(impl.name): impl
-                for p in config.recipe.packages
-                for m in iter_modules(import_module(p).__path__, f"{p}.")
-                for impl in findimpls(import_module(m.name), Recipe)}
+        allimpls = RecipeImpls(config.recipe.packages, Recipe, Path(config.recipe.index.dir))
         groupmemotypes = {}
         recipeinfos = {}
         pypinames = {}
         def adddepends(info):
             for group in info.groups:
                 if group not in groupmemotypes:
-                    groupmemotypes[group] = type(f"{'Or'.join(allimpls[normname].__name__ for normname in sorted(group))}Memo", (), {})
+                    groupmemotypes[group] = type(f"{'Or'.join(allimpls.classname(normname) for normname in sorted(group))}Memo", (), {})
             for normdepend, depend in info.depends.items():
                 if normdepend not in recipeinfos and normdepend not in pypinames:
                     if normdepend in allimpls:
@@ -97,9 +98,10 @@ class GraphImpl(Graph):
                         adddepends(info)
                     else:
                         pypinames[normdepend] = depend # Keep an arbitrary unnormalised name.
+        requirements = _requirements(config.requirements)
         # TODO: Minimise depends declared here.
         adddepends(RecipeInfo(SimpleNamespace(depends = [
-                'python3', 'bdozlib', 'android', 'sdl2' if 'sdl2' == config.bootstrap.name else 'genericndkbuild', *_namesonly(config.requirements)])))
+                'python3', 'bdozlib', 'android', 'sdl2' if 'sdl2' == config.bootstrap.name else 'genericndkbuild', *(r.name for r in requirements.values())])))
         for group in groupmemotypes:
             intersection = sorted(recipeinfos.keys() & group)
             groupstr = ', '.join(sorted(group))
@@ -119,11 +121,15 @@ class GraphImpl(Graph):
         for normname, info in recipeinfos.items():
             dependmemotypes = list(info.dependmemotypes(groupmemotypes, implmemotypes))
             implmemotype = implmemotypes[normname]
+            sharedmask = list(info.dependarchindependent(recipeinfos)) if info.impl.archindependent else None
             @types(info.impl, Make, *dependmemotypes, this = implmemotype)
-            def builder(recipe, make, *memos):
-                return make(recipe.recipebuilddir, list(memos), recipe.mainbuild)
+            def builder(recipe, make, *memos, sharedmask = sharedmask):
+                if sharedmask is None:
+                    return make(recipe.recipebuilddir, list(memos), recipe.mainbuild)
+                # Shared by all archs and projects, so must not depend on anything arch-specific:
+                return make(recipe.recipebuilddir, [*recipe.shareddependencies, *(memo for memo, shared in zip(memos, sharedmask) if shared)], recipe.mainbuild, shared = True)
             log.debug("%s(%s) requires: %s", implmemotype.__name__, ', '.join(b.__name__ for b in implmemotype.__bases__),
                     ', '.join(t.__name__ for t in dependmemotypes) if dependmemotypes else ())
             self.builders.append(builder)
-        self.pypinames = list(pypinames.values())
-        log.info("Requirements not found as recipes will be installed with pip: %s", ', '.join(self.pypinames))
+        self.pypirequires = [str(requirements.get(normname, name)) for normname, name in pypinames.items()] # Keep any version specifiers.
+        log.info("Requirements not found as recipes will be installed with pip: %s", ', '.join(self.pypirequires))
@@ -0,0 +1,131 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from .util import findimpls
+from importlib import import_module
+from lagoon.util import atomic
+from packaging.utils import canonicalize_name
+from pathlib import Path
+from pkgutil import iter_modules
+import json, logging, os
+
+log = logging.getLogger(__name__)
+
+class RecipeIndex:
+    'Where each recipe in a package is defined, so that only the recipes actually used need importing.'
+
+    filename = '.Cowpox-index.json'
+
+    def __init__(self, packagename, basetype, cachedir):
+        self.packagename = packagename
+        self.basetype = basetype
+        self.cachedir = cachedir
+
+    def _indexpaths(self, package):
+        'The index built when the package was installed, then one in the cache for when the package is not writable by the build.'
+        yield Path(package.__path__[0], self.filename)
+        if self.cachedir is not None:
+            yield self.cachedir / f"{self.packagename}.json"
+
+    @staticmethod
+    def _read(indexpath):
+        try:
+            with indexpath.open() as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def load(self):
+        'Return recipe locations, importing only modules that changed since an index was written, and write the index if it was not current.'
+        package = import_module(self.packagename)
+        indexpaths = list(self._indexpaths(package))
+        mtimes = {m.name: os.stat(m.module_finder.find_spec(m.name).origin).st_mtime_ns for m in iter_modules(package.__path__, f"{self.packagename}.")}
+        currententries = {}
+        for indexpath in indexpaths:
+            oldmodules = self._read(indexpath)
+            if {name: entry['mtime'] for name, entry in oldmodules.items()} == mtimes:
+                return self._locations(oldmodules)
+            for name, entry in oldmodules.items():
+                if mtimes.get(name) == entry['mtime']:
+                    currententries.setdefault(name, entry)
+        modules = {}
+        for name, mtime in mtimes.items():
+            entry = currententries.get(name)
+            if entry is None:
+                log.debug("Index recipes in: %s", name)
+                entry = dict(mtime = mtime, recipes = {canonicalize_name(impl.name): [impl.__module__, impl.__qualname__]
+                        for impl in findimpls(import_module(name), self.basetype)})
+            modules[name] = entry
+        for indexpath in indexpaths:
+            try:
+                with atomic(indexpath) as partialpath, partialpath.open('w') as f:
+                    json.dump(modules, f, indent = 4)
+                break
+            except OSError:
+                log.debug("Index not writable: %s", indexpath)
+        else:
+            log.warning("Index not writable anywhere, keeping it in memory: %s", self.packagename)
+        return self._locations(modules)
+
+    @staticmethod
+    def _locations(modules):
+        return {normname: location for entry in modules.values() for normname, location in entry['recipes'].items()}
+
+class RecipeImpls:
+
+    def __init__(self, packagenames, basetype, cachedir):
+        self.locations = {}
+        for packagename in packagenames:
+            self.locations.update(RecipeIndex(packagename, basetype, cachedir).load())
+        self.impls = {}
+
+    def __contains__(self, normname):
+        return normname in self.locations
+
+    def __getitem__(self, normname):
+        try:
+            return self.impls[normname]
+        except KeyError:
+            modulename, qualname = self.locations[normname]
+            self.impls[normname] = impl = getattr(import_module(modulename), qualname)
+            return impl
+
+    def classname(self, normname):
+        return self.locations[normname][1]
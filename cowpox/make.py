@@ -40,17 +40,31 @@
 
 from diapyr import types
 from uuid import uuid4
-import json, logging, shutil
+import fcntl, json, logging, shutil
 
 log = logging.getLogger(__name__)
 
+def builduuid(target):
+    'Of the current build of the given target.'
+    with (target / '.Cowpox' / 'info.json').open() as f:
+        return json.load(f)['uuid']
+
 class Make:
 
     @types()
     def __init__(self, log = log):
         self.log = log
 
-    def __call__(self, target, dependencies, install):
+    def __call__(self, target, dependencies, install, shared = False, update = None):
+        '''If shared, the target may be made concurrently by other builds so serialise them with a lock file.
+        If update is given, it is called with the old dependencies to bring an OK target up to date instead of deleting it.'''
+        if not shared:
+            return self._make(target, dependencies, install, update)
+        with (target.parent.mkdirp() / f"{target.name}.lock").open('a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            return self._make(target, dependencies, install, update)
+
+    def _make(self, target, dependencies, install, update):
         infodir = target / '.Cowpox'
         infopath = infodir / 'info.json' # TODO: Exclude from artifact.
         okpath = infodir / 'OK'
@@ -60,8 +74,14 @@ class Make:
             if info['dependencies'] == dependencies:
                 self.log.info("[%s] Already OK.", target)
                 return info['uuid']
-            self.log.info("[%s] Rebuild due to changed dependencies.", target)
-            shutil.rmtree(target)
+            if update is None:
+                self.log.info("[%s] Rebuild due to changed dependencies.", target)
+                shutil.rmtree(target)
+                install()
+            else:
+                self.log.info("[%s] Update due to changed dependencies.", target)
+                okpath.rmdir() # An interrupted update must not look OK.
+                update(info['dependencies'])
         else:
             self.log.info("[%s] Start build.", target)
             if target.exists():
@@ -69,9 +89,9 @@ class Make:
                 shutil.rmtree(target)
             else:
                 target.pmkdirp()
-        install()
+            install()
         uuid = str(uuid4())
-        infodir.mkdir()
+        infodir.mkdir(exist_ok = True)
         with infopath.open('w') as f:
             json.dump(dict(dependencies = dependencies, uuid = uuid), f, indent = 4)
             print(file = f)
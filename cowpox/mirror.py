@@ -43,6 +43,7 @@ from diapyr import types
 from hashlib import md5
 from lagoon.util import atomic
 from pathlib import Path
+from threading import Lock
 from urllib.request import Request, urlopen
 import logging, time
 
@@ -57,8 +58,13 @@ class Mirror:
     @types(Config)
     def __init__(self, config):
         self.mirror = Path(config.container.mirror)
+        self.lock = Lock()
 
     def download(self, url):
+        with self.lock: # Arch builds tend to want the same things at the same time.
+            return self._download(url)
+
+    def _download(self, url):
         mirrorpath = self.mirror / md5(url.encode('ascii')).hexdigest()
         if mirrorpath.exists():
             log.info("Already downloaded: %s", url)
@@ -176,6 +176,9 @@ class Platform:
         ignored = {'.DS_Store', '.ds_store'}
         return max((p.name for p in (self.sdk_dir / 'build-tools').iterdir() if p.name not in ignored), key = LooseVersion)
 
+    def buildtool(self, name):
+        return Program.text(self.sdk_dir / 'build-tools' / self.build_tools_version() / name)
+
     def _apilevels(self):
         avdmanagerpath = self.sdk_dir / 'tools' / 'bin' / 'avdmanager'
         if avdmanagerpath.exists():
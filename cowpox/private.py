@@ -39,15 +39,16 @@
 # THE SOFTWARE.
 
 from . import InterpreterRecipe, PipInstallMemo, PrivateMemo, RecipeMemo
-from .container import compileall
-from .make import Make
+from .archive import writezip, zipbytecode
+from .container import compileall, materialise
+from .filter import compilepatterns
+from .make import builduuid, Make
 from .pyrecipe import PythonRecipe
+from .shake import filereachable, modulename, Reachability
 from aridity.config import Config
 from diapyr import types
-from fnmatch import fnmatch
-from lagoon import zip
 from pathlib import Path
-import logging, os, shutil
+import json, logging, os, shutil
 
 log = logging.getLogger(__name__)
 
@@ -63,32 +64,24 @@ class Private:
         'idlelib',
         'tkinter',
     }
-    stdlib_filen_blacklist = [
+    stdlib_filen_blacklist = compilepatterns([
         '*.py',
         '*.exe',
         '*.whl',
-    ]
+    ])
     site_packages_dir_blacklist = {
         '__pycache__',
         'tests',
         '.Cowpox',
     }
-    site_packages_filen_blacklist = [
-        '*.py',
-    ]
+    site_packages_filen_blacklist = compilepatterns([]) # Sources are needed to compile, AssetArchive excludes them.
 
     @staticmethod
-    def _walk_valid_filens(base_dir, invalid_dir_names, invalid_file_patterns):
+    def _walk_valid_filens(base_dir, invalid_dir_names, invalid_filen_regex):
         for dirn, subdirs, filens in os.walk(base_dir):
-            for i in reversed(range(len(subdirs))):
-                subdir = subdirs[i]
-                if subdir in invalid_dir_names:
-                    subdirs.pop(i)
+            subdirs[:] = (d for d in subdirs if d not in invalid_dir_names)
             for filen in filens:
-                for pattern in invalid_file_patterns:
-                    if fnmatch(filen, pattern):
-                        break
-                else:
+                if invalid_filen_regex.match(filen) is None:
                     yield Path(dirn, filen)
 
     @types(Config, InterpreterRecipe, [PythonRecipe])
@@ -100,48 +93,97 @@ class Private:
         self.orientation = config.android.orientation
         self.minsdkversion = config.android.minSdkVersion
         self.skel_path = Path(config.skel.path)
+        self.pycunchecked = config.pyc.unchecked
+        self.stdlibcompress = not config.stdlib.zip.stored
+        self.zipparallel = config.zip.parallel
+        self.stdlibshake = config.stdlib.shake
+        self.sitepackageszip = config.sitepackages.zip.enabled
+        self.sitepackagescompress = not config.sitepackages.zip.stored
+        self.stdlibkeep = list(config.stdlib.keep)
+        self.configdeps = [
+            self.bootstrap_name,
+            self.fullscreen,
+            self.orientation,
+            self.minsdkversion,
+            self.pycunchecked,
+            self.stdlibcompress,
+            self.stdlibshake,
+            self.stdlibkeep,
+            self.sitepackageszip,
+            self.sitepackagescompress,
+        ]
+        self.manifestpath = self.bundle_dir / '.Cowpox' / 'recipes.json'
         self.config = -config
         self.interpreter = interpreter
         self.recipes = recipes
 
     @types(Make, PipInstallMemo, [RecipeMemo], this = PrivateMemo)
     def create_python_bundle(self, make, pipinstallmemo, recipememos):
-        return make(self.private_dir, [
-            self.bootstrap_name,
-            self.fullscreen,
-            self.orientation,
-            self.minsdkversion,
-            pipinstallmemo,
-            recipememos,
-        ], self._createbundle)
+        return make(self.private_dir, [self.configdeps, pipinstallmemo, recipememos], self._createbundle, update = self._updatebundle)
 
     def _createbundle(self):
+        self._syncbundle({})
+
+    def _updatebundle(self, olddependencies):
+        if olddependencies[0] != self.configdeps or self.sitepackageszip: # Zipping moves files out from under the manifest.
+            log.info("Recreate: %s", self.private_dir)
+            shutil.rmtree(self.private_dir)
+            self._createbundle()
+        else:
+            with self.manifestpath.open() as f:
+                self._syncbundle(json.load(f))
+
+    def _syncbundle(self, manifest):
         self._copy_application_sources()
-        module_filens = self.interpreter.module_filens()
-        modules_dir = (self.bundle_dir / 'modules').mkdirp()
-        log.info("Copy %s files into the bundle", len(module_filens))
-        for filen in module_filens:
-            shutil.copy2(filen, modules_dir)
-        stdlib_filens = list(self._walk_valid_filens(self.interpreter.stdlibdir, self.stdlib_dir_blacklist, self.stdlib_filen_blacklist))
-        log.info("Zip %s files into the bundle", len(stdlib_filens))
-        zip[print](self.bundle_dir / 'stdlib.zip', *(p.relative_to(self.interpreter.stdlibdir) for p in stdlib_filens), cwd = self.interpreter.stdlibdir)
-        sitepackagesdir = (self.bundle_dir / 'site-packages').mkdirp()
+        self.interpreter.compileall(self.pycunchecked)
+        sitepackagesdir = self.bundle_dir / 'site-packages'
+        self._syncsitepackages(sitepackagesdir, manifest)
+        isreachable = self._reachability(sitepackagesdir) if self.stdlibshake else lambda name: True
+        modules_dir = self.bundle_dir / 'modules'
+        if modules_dir.exists():
+            shutil.rmtree(modules_dir)
+        materialise({p: filen for p, filen in self._modulepaths().items() if not filen.name.endswith('.so') or isreachable(modulename(Path(filen.name)))})
+        stdlib_filens = [p for p in self._walk_valid_filens(self.interpreter.stdlibdir, self.stdlib_dir_blacklist, self.stdlib_filen_blacklist)
+                if filereachable(isreachable, p.relative_to(self.interpreter.stdlibdir))]
+        writezip(self.bundle_dir / 'stdlib.zip', {str(p.relative_to(self.interpreter.stdlibdir)): p for p in stdlib_filens}, self.stdlibcompress, self.zipparallel)
+        compileall(self.private_dir, unchecked = self.pycunchecked)
+        if self.sitepackageszip:
+            zipbytecode(sitepackagesdir, self.bundle_dir / 'site-packages.zip', self.sitepackagescompress, self.zipparallel)
+        with self.manifestpath.pmkdirp().open('w') as f:
+            json.dump(manifest, f, indent = 4)
+            print(file = f)
+
+    def _syncsitepackages(self, sitepackagesdir, manifest):
+        'Replace the files of each recipe built since the manifest was written, and update the manifest. Where recipes overlap the later one wins.'
+        uuids = {recipe.name: builduuid(recipe.recipebuilddir) for recipe in self.recipes}
+        dirpaths = set()
+        for name, entry in list(manifest.items()):
+            if uuids.get(name) != entry['uuid']:
+                log.info("Remove from site-packages: %s", name)
+                for relpath in entry['paths']:
+                    path = sitepackagesdir / relpath
+                    path.unlink(missing_ok = True)
+                    if path.suffix == '.py':
+                        path.with_name(f"{path.name}c").unlink(missing_ok = True)
+                    dirpaths.add(path.parent)
+                del manifest[name]
+        for dirpath in sorted(dirpaths, key = lambda p: len(p.parts), reverse = True):
+            while dirpath != sitepackagesdir and dirpath.exists() and not any(dirpath.iterdir()):
+                dirpath.rmdir()
+                dirpath = dirpath.parent
+        paths = {}
+        fresh = set()
         for recipe in self.recipes:
-            # TODO: Get bundlepackages from a result object coming out of every recipe.
-            filens = list(self._walk_valid_filens(recipe.bundlepackages, self.site_packages_dir_blacklist, self.site_packages_filen_blacklist))
-            log.info("Copy %s files into the site-packages", len(filens))
-            for filen in filens:
-                shutil.copy2(filen, (sitepackagesdir / filen.relative_to(recipe.bundlepackages)).pmkdirp())
-        log.info('Renaming .so files to reflect cross-compile')
-        self._reduce_object_file_names(sitepackagesdir)
-        log.info("Frying eggs in: %s", sitepackagesdir)
-        for rd in sitepackagesdir.iterdir():
-            if rd.is_dir() and rd.name.endswith('.egg'):
-                log.debug("Egg: %s", rd.name)
-                for f in rd.iterdir():
-                    if f.name != 'EGG-INFO':
-                        f.rename(sitepackagesdir / f.name)
-                shutil.rmtree(rd)
+            recipepaths = self._sitepackagespaths(sitepackagesdir, recipe)
+            if recipe.name not in manifest:
+                manifest[recipe.name] = dict(uuid = uuids[recipe.name], paths = sorted(str(p.relative_to(sitepackagesdir)) for p in recipepaths))
+                fresh.update(recipepaths)
+            paths.update(recipepaths)
+        topathtofrompath = {p: filen for p, filen in paths.items() if p in fresh or not p.exists()} # Unchanged recipes are already in place.
+        for p in topathtofrompath:
+            if p.exists():
+                p.unlink() # Never modify in place, it may be a link into a recipe build.
+        materialise(topathtofrompath)
 
     def _copy_application_sources(self):
         topath = self.private_dir.mkdirp() / 'main.py'
@@ -161,14 +203,36 @@ class Private:
                 print(f"P4A_IS_WINDOWED={not self.fullscreen}", file = f)
                 print(f"P4A_ORIENTATION={self.orientation}", file = f)
             print(f"P4A_MINSDK={self.minsdkversion}", file = f)
-        compileall(self.private_dir)
-
-    def _reduce_object_file_names(self, dirn):
-        """Recursively renames all files named YYY.cpython-...-linux-gnu.so"
-        to "YYY.so", i.e. removing the erroneous architecture name
-        coming from the local system.
-        """
-        for filen in dirn.rglob('*.so'):
-            parts = filen.name.split('.')
-            if len(parts) > 2:
-                filen.rename(filen.parent / f"{parts[0]}.so")
+
+    def _reachability(self, sitepackagesdir):
+        'Modules reachable from the app and site-packages, for excluding the rest of the stdlib.'
+        rootnames = [p.stem for p in self.private_dir.glob('*.py')]
+        rootnames.extend(modulename(p.relative_to(sitepackagesdir)) for p in sitepackagesdir.rglob('*.py'))
+        return Reachability(rootnames, [self.private_dir, sitepackagesdir, self.interpreter.stdlibdir], self.stdlibkeep)
+
+    def _modulepaths(self):
+        modules_dir = self.bundle_dir / 'modules'
+        return {modules_dir / filen.name: filen for filen in self.interpreter.module_filens()}
+
+    def _sitepackagespaths(self, sitepackagesdir, recipe):
+        'Final path in site-packages of every file the recipe puts there, mapped to its source.'
+        paths = {}
+        # TODO: Get bundlepackages from a result object coming out of every recipe.
+        for filen in self._walk_valid_filens(recipe.bundlepackages, self.site_packages_dir_blacklist, self.site_packages_filen_blacklist):
+            relpath = self._sitepackagesrelpath(filen.relative_to(recipe.bundlepackages))
+            if relpath is not None:
+                paths[sitepackagesdir / relpath] = filen
+        return paths
+
+    @staticmethod
+    def _sitepackagesrelpath(relpath):
+        'Fry eggs, and rename YYY.cpython-...-linux-gnu.so to YYY.so as the architecture name comes from the local system.'
+        parts = list(relpath.parts)
+        if len(parts) > 1 and parts[0].endswith('.egg'):
+            if 'EGG-INFO' == parts[1]:
+                return
+            del parts[0]
+        nameparts = parts[-1].split('.')
+        if parts[-1].endswith('.so') and len(nameparts) > 2:
+            parts[-1] = f"{nameparts[0]}.so"
+        return Path(*parts)
@@ -39,23 +39,84 @@
 # THE SOFTWARE.
 
 from . import InterpreterRecipe, ObjRepo
-from .container import compileall
+from .cache import filedigest, KeyCache, keydigest
 from .recipe import Recipe
+from .wheel import Wheelhouse
+from aridity.config import Config
 from diapyr import types
 from lagoon import python
 from lagoon.program import partial
-import logging, shutil, subprocess
+from pathlib import Path
+import logging, re, shutil, subprocess
 
 log = logging.getLogger(__name__)
 
+class CythonCache:
+    'Generated C depends only on the pyx, its includes and the Cython version, so is shared across archs and projects.'
+
+    headersuffixes = '.h', '_api.h'
+    languagepattern = re.compile(r'#\s*distutils\s*:\s*language\s*=\s*c\+\+\s*$')
+
+    @types(Config)
+    def __init__(self, config):
+        self.cache = KeyCache(Path(config.cython.cache.dir))
+
+    def cythonize(self, srcdir, pyxpaths, env):
+        version = python._c('import Cython; print(Cython.__version__)', env = env).rstrip()
+        includesdigest = keydigest([[str(p.relative_to(srcdir)), filedigest(p)]
+                for p in sorted(path for pattern in ['*.pxd', '*.pxi'] for path in srcdir.rglob(pattern))])
+        misses = {}
+        for pyxpath in pyxpaths:
+            relpath = pyxpath.relative_to(srcdir)
+            key = keydigest([version, includesdigest, str(relpath), filedigest(pyxpath)])
+            entry = self.cache.get(key)
+            if entry is None:
+                misses[relpath] = key
+            else:
+                log.debug("Cython cache hit: %s", relpath)
+                for path in entry.iterdir():
+                    shutil.copyfile(path, pyxpath.parent / path.name)
+        log.info("Cython cache misses: %s of %s", len(misses), len(pyxpaths))
+        if not misses:
+            return
+        for relpath in misses:
+            sourcepath = self._outputpaths(srcdir / relpath)[0]
+            if sourcepath.exists():
+                sourcepath.unlink() # Must not be mistaken for fresh output.
+        python[print]('-m', 'Cython.Build.Cythonize', '--force', *misses, env = env, cwd = srcdir)
+        for relpath, key in misses.items():
+            sourcepath, *headerpaths = self._outputpaths(srcdir / relpath)
+            with self.cache.put(key) as entry:
+                entry.mkdir()
+                shutil.copy2(sourcepath, entry)
+                for path in headerpaths:
+                    if path.exists():
+                        shutil.copy2(path, entry)
+
+    @classmethod
+    def _outputpaths(cls, pyxpath):
+        'The generated source, whose language is given by a directive in the leading comments, followed by any headers.'
+        suffix = '.c'
+        with pyxpath.open() as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    break
+                if cls.languagepattern.match(line) is not None:
+                    suffix = '.cpp'
+        return [pyxpath.with_suffix(suffix), *(pyxpath.with_name(f"{pyxpath.stem}{s}") for s in cls.headersuffixes)]
+
 class PythonRecipe(Recipe):
 
     depends = ['python3']
+    archindependent = True
+    wheelcache = False
 
-    @types(InterpreterRecipe)
-    def __init(self, interpreterrecipe):
+    @types(InterpreterRecipe, Wheelhouse)
+    def __init(self, interpreterrecipe, wheelhouse):
         self.bundlepackages = self.recipebuilddir / 'Cowpox-bundle'
         self.interpreterrecipe = interpreterrecipe
+        self.wheelhouse = wheelhouse
 
     def get_recipe_env(self):
         env = self.arch.env.copy()
@@ -70,35 +131,45 @@ class PythonRecipe(Recipe):
     def install_python_package(self, env = None):
         if env is None:
             env = self.get_recipe_env()
+        if self.wheelcache:
+            self.wheelhouse.install(self, env, lambda: self._buildandinstall(env))
+        else:
+            self._buildandinstall(env)
+
+    def build_python_package(self, env):
+        pass
+
+    def _buildandinstall(self, env):
+        self.build_python_package(env)
         log.info("Install %s into bundle.", self.name)
         rdir = self.bundlepackages / 'r'
         python[print]('setup.py', 'install', '-O2', '--root', rdir, '--install-lib', 'l', env = env, cwd = self.recipebuilddir)
         for p in (rdir / 'l').iterdir():
             p.rename(self.bundlepackages / p.name)
         shutil.rmtree(rdir)
-        compileall(self.bundlepackages)
 
 class CompiledComponentsPythonRecipe(PythonRecipe):
 
+    archindependent = False
+    wheelcache = True
     build_ext_args = ()
 
-    def install_python_package(self, env = None):
-        if env is None:
-            env = self.get_recipe_env()
+    def build_python_package(self, env):
         log.info("Building compiled components in %s", self.name)
         python[print]('setup.py', 'build_ext', '-v', *self.build_ext_args, env = env, cwd = self.recipebuilddir)
         self.striplibs() # FIXME LATER: Inexplicably leaves _bounded_integers.so unstripped.
-        super().install_python_package(env)
 
 class CythonRecipe(PythonRecipe):
 
-    @types([ObjRepo])
-    def __init(self, objrepos):
+    archindependent = False
+    wheelcache = True
+
+    @types([ObjRepo], CythonCache)
+    def __init(self, objrepos, cythoncache):
         self.objrepos = objrepos
+        self.cythoncache = cythoncache
 
-    def install_python_package(self, env = None):
-        if env is None:
-            env = self.get_recipe_env()
+    def build_python_package(self, env):
         log.info("Cythonizing anything necessary in %s", self.name)
         log.info("Trying first build of %s to get cython files: this is expected to fail", self.name)
         manually_cythonise = False
@@ -117,7 +188,6 @@ class CythonRecipe(PythonRecipe):
         else:
             log.info('First build appeared to complete correctly, skipping manualcythonising.')
         self.striplibs() # TODO: This breaks if host-arch libs are in the tree.
-        super().install_python_package(env)
 
     def cythonize_build(self, env):
         log.info('Running Cython where appropriate.')
@@ -129,7 +199,7 @@ class CythonRecipe(PythonRecipe):
         env.pop('PYTHONNOUSERSITE', None)
         paths = list(self.pyxpaths())
         log.debug("Cythonize: %s", paths)
-        python[print]('-m', 'Cython.Build.Cythonize', *paths, env = env)
+        self.cythoncache.cythonize(self.recipebuilddir, paths, env)
 
     def pyxpaths(self):
         return self.recipebuilddir.rglob('*.pyx')
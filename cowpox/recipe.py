@@ -39,27 +39,36 @@
 # THE SOFTWARE.
 
 from . import Arch
+from .cache import keydigest, treedigest
 from .mirror import Mirror
 from .platform import Platform
 from aridity.config import Config
 from diapyr import types
 from lagoon import patch, tar, unzip
 from pathlib import Path
+from tempfile import TemporaryDirectory
 from zipfile import ZipFile
-import hashlib, logging, shutil, subprocess
+import hashlib, logging, shutil, subprocess, sys
 
 log = logging.getLogger(__name__)
 
 class Recipe:
 
     depends = ()
+    archindependent = False
 
     @types(Config, Platform, Mirror, Arch)
     def __init__(self, config, platform, mirror, arch):
-        self.recipebuilddir = Path(config.builds.dir, self.name)
+        self.recipe_patch_dir = Path(config.patch.dir, self.name) # XXX: Or use normalised name?
+        if self.archindependent:
+            # Projects with different versions or patches must not thrash the same shared build:
+            version = getattr(self, 'version', None)
+            self.shareddependencies = [version, list(sys.version_info[:2]), treedigest(self.recipe_patch_dir)]
+            self.recipebuilddir = Path(config.shared.builds.dir, f"{self.name}-{version}-{keydigest(self.shareddependencies)}")
+        else:
+            self.recipebuilddir = Path(config.builds.dir, self.name)
         self.projectbuilddir = Path(config.build.dir)
         self.extroot = Path(config.container.extroot)
-        self.recipe_patch_dir = Path(config.patch.dir, self.name) # XXX: Or use normalised name?
         self.platform = platform
         self.mirror = mirror
         self.arch = arch
@@ -103,23 +112,22 @@ class Recipe:
                 raise ValueError(f"Generated md5sum does not match expected md5sum for {self.name} recipe")
             log.debug("[%s] MD5 OK.", self.name)
         log.info("[%s] Unpack for: %s", self.name, self.arch.name)
-        # TODO LATER: Not such a good idea to use parent.
         # TODO LATER: Do not assume single top-level directory in archive.
-        if url.endswith('.zip'):
-            try:
-                unzip[print](archivepath, cwd = self.recipebuilddir.parent)
-            except subprocess.CalledProcessError as e:
-                if e.returncode not in {1, 2}:
-                    raise
-            with ZipFile(archivepath) as zf:
-                rootname = zf.filelist[0].filename.split('/')[0]
-        elif url.endswith(('.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')):
-            tar.xf[print](archivepath, cwd = self.recipebuilddir.parent)
-            rootname = tar.tf(archivepath).splitlines()[0].split('/')[0]
-        else:
-            raise Exception(f"Unsupported archive type: {url}")
-        if rootname != self.recipebuilddir.name:
-            self.recipebuilddir.with_name(rootname).rename(self.recipebuilddir)
+        with TemporaryDirectory(dir = self.recipebuilddir.parent) as tempdir: # Private to this build, and on the same filesystem for the rename.
+            if url.endswith('.zip'):
+                try:
+                    unzip[print](archivepath, cwd = tempdir)
+                except subprocess.CalledProcessError as e:
+                    if e.returncode not in {1, 2}:
+                        raise
+                with ZipFile(archivepath) as zf:
+                    rootname = zf.filelist[0].filename.split('/')[0]
+            elif url.endswith(('.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')):
+                tar.xf[print](archivepath, cwd = tempdir)
+                rootname = tar.tf(archivepath).splitlines()[0].split('/')[0]
+            else:
+                raise Exception(f"Unsupported archive type: {url}")
+            Path(tempdir, rootname).rename(self.recipebuilddir)
 
     def striplibs(self):
         self.arch.striplibs(self.recipebuilddir)
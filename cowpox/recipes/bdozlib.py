@@ -48,6 +48,7 @@ import shutil
 class RecipeImpl(CythonRecipe):
 
     name = 'bdozlib'
+    wheelcache = False # The app changes on every edit.
 
     @types(Config)
     def __init(self, config):
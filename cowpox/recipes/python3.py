@@ -159,5 +159,7 @@ class Python3Recipe(Recipe, InterpreterRecipe, LibRepo):
         make.all[print]('-j', cpu_count(), f"INSTSONAME={self.instsoname}", env = env, cwd = self.androidbuild)
         self.striplibs()
         shutil.copy2(self.androidbuild / 'pyconfig.h', self.include_root())
-        compileall(self.modules_build_dir)
-        compileall(self.stdlibdir, False)
+
+    def compileall(self, unchecked):
+        compileall(self.modules_build_dir, unchecked = unchecked)
+        compileall(self.stdlibdir, False, unchecked)
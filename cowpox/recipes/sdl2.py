@@ -49,6 +49,8 @@ import shutil
 
 class LibSDL2Module(Recipe):
 
+    archindependent = True
+
     def installmodule(self, jni_dir):
         # XXX: Would a symlink be sufficient?
         shutil.copytree(self.recipebuilddir, jni_dir / self.dir_name)
@@ -0,0 +1,74 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from modulefinder import ModuleFinder
+import logging
+
+log = logging.getLogger(__name__)
+
+def modulename(relpath):
+    'Dotted name of the module at the given path relative to its sys.path entry.'
+    parts = [*relpath.parent.parts, relpath.name.split('.')[0]]
+    if '__init__' == parts[-1]:
+        parts.pop()
+    return '.'.join(parts)
+
+def filereachable(isreachable, relpath):
+    'Whether to keep the file at the given path relative to its sys.path entry, which if not a module is kept with its package, if any.'
+    if relpath.name.endswith(('.py', '.pyc', '.so')):
+        return isreachable(modulename(relpath))
+    return 1 == len(relpath.parts) or isreachable('.'.join(relpath.parent.parts))
+
+class Reachability:
+    'Which modules the given sources may import, as far as static analysis can tell.'
+
+    def __init__(self, rootnames, searchpath, keep):
+        self.keep = keep
+        finder = ModuleFinder([str(p) for p in searchpath])
+        for name in sorted({*rootnames, *keep}):
+            try:
+                finder.import_hook(name)
+            except (ImportError, SyntaxError) as e:
+                log.debug("Not analysed: %s %r", name, e)
+        self.names = finder.modules.keys() | finder.badmodules.keys() # Extension modules for the target are missing as far as the finder knows.
+        log.info("Reachable modules: %s", len(self.names))
+
+    def __call__(self, name):
+        return name in self.names or any(name == k or name.startswith(f"{k}.") for k in self.keep)
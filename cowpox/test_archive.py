@@ -0,0 +1,217 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from .archive import abiprefix, extractdelta, formatmanifest, GzipWriter, manifestname, parsemanifest, repackzip, unmappablelibs, writezip, zipbytecode
+from .container import compileall
+from hashlib import md5
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+from zipimport import zipimporter
+import gzip, os, random, struct, tarfile
+
+class TestArchive(TestCase):
+
+    def test_writezip(self):
+        with TemporaryDirectory() as tempdir:
+            tempdir = Path(tempdir)
+            paths = {}
+            for name, text in [['b/x.py', 'x = 1\n' * 100], ['a.py', 'y = 2\n'], ['é.txt', '']]:
+                paths[name] = path = (tempdir / 'src' / name).pmkdirp()
+                path.write_text(text)
+            for compress, compresstype in [[True, ZIP_DEFLATED], [False, ZIP_STORED]]:
+                zippath = tempdir / f"{compress}.zip"
+                writezip(zippath, paths, compress)
+                with ZipFile(zippath) as zf:
+                    self.assertIsNone(zf.testzip())
+                    self.assertEqual(['a.py', 'b/x.py', 'é.txt'], zf.namelist())
+                    for info in zf.infolist():
+                        self.assertEqual(compresstype, info.compress_type)
+                        self.assertEqual((1980, 1, 1, 0, 0, 0), info.date_time)
+                        self.assertEqual(paths[info.filename].read_bytes(), zf.read(info))
+            os.utime(paths['a.py'], (0, 0))
+            data = zippath.read_bytes()
+            writezip(tempdir / 'again.zip', paths, False, True)
+            self.assertEqual(data, (tempdir / 'again.zip').read_bytes())
+            mtime = zippath.stat().st_mtime_ns
+            writezip(zippath, paths, False)
+            self.assertEqual(mtime, zippath.stat().st_mtime_ns)
+            paths['a.py'].write_text('y = 3\n')
+            writezip(zippath, paths, False)
+            with ZipFile(zippath) as zf:
+                self.assertEqual(b'y = 3\n', zf.read('a.py'))
+
+    def test_zipbytecode(self):
+        with TemporaryDirectory() as tempdir:
+            sitepackages = Path(tempdir, 'site-packages')
+            for relpath in 'pure/__init__.py', 'pure/sub/__init__.py', 'pure/sub/x.py', 'data/__init__.py', 'data/res.json', 'top.py', 'nspkg/y.py', 'ext.so':
+                (sitepackages / relpath).pmkdirp().write_text(f"name = {relpath!r}\n")
+            compileall(sitepackages)
+            zippath = Path(tempdir, 'site-packages.zip')
+            zipbytecode(sitepackages, zippath)
+            with ZipFile(zippath) as zf:
+                self.assertEqual(['pure/__init__.pyc', 'pure/sub/__init__.pyc', 'pure/sub/x.pyc', 'top.pyc'], zf.namelist())
+            self.assertEqual(['data', 'ext.so', 'nspkg'], sorted(p.name for p in sitepackages.iterdir()))
+            importer = zipimporter(str(zippath))
+            namespace = {}
+            exec(importer.get_code('top'), namespace)
+            self.assertEqual('top.py', namespace['name'])
+            self.assertTrue(importer.is_package('pure'))
+
+    def test_gzipwriter(self):
+        r = random.Random(0)
+        data = bytes(r.choice(b'abcdefgh') for _ in range(50000)) * 3
+        outputs = []
+        for level in 1, 9:
+            for parallel in False, True:
+                f = BytesIO()
+                with GzipWriter(f, level, parallel) as g:
+                    g.blocksize = 10000
+                    for i in range(0, len(data), 7777):
+                        g.write(data[i:i + 7777])
+                    self.assertEqual(len(data), g.tell())
+                self.assertEqual(data, gzip.decompress(f.getvalue()))
+                outputs.append(f.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[2], outputs[3])
+        self.assertLess(len(outputs[2]), len(data) // 2)
+        f = BytesIO()
+        with GzipWriter(f):
+            pass
+        self.assertEqual(b'', gzip.decompress(f.getvalue()))
+
+    def test_gzipwritertar(self):
+        with TemporaryDirectory() as tempdir:
+            path = Path(tempdir, 'x.txt')
+            path.write_text('x' * 100000)
+            f = BytesIO()
+            with GzipWriter(f, parallel = True) as g, tarfile.open(fileobj = g, mode = 'w', format = tarfile.USTAR_FORMAT) as tf:
+                tf.add(path, 'x.txt')
+            f.seek(0)
+            with tarfile.open(fileobj = f, mode = 'r:gz') as tf:
+                self.assertEqual(b'x' * 100000, tf.extractfile('x.txt').read())
+
+    def _deltatar(self, relpathtodata):
+        f = BytesIO()
+        with tarfile.open(fileobj = f, mode = 'w', format = tarfile.USTAR_FORMAT) as tf:
+            for name, data in [[manifestname, formatmanifest({relpath: md5(data).hexdigest() for relpath, data in relpathtodata.items()})], *sorted(relpathtodata.items())]:
+                if '/' in name:
+                    info = tarfile.TarInfo(name.rsplit('/', 1)[0])
+                    info.type = tarfile.DIRTYPE
+                    tf.addfile(info)
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tf.addfile(info, BytesIO(data))
+        f.seek(0)
+        return tarfile.open(fileobj = f)
+
+    def test_extractdelta(self):
+        with TemporaryDirectory() as tempdir:
+            target = Path(tempdir)
+            self.assertEqual((['a', 'b/c', 'd'], []), extractdelta(self._deltatar({'a': b'1', 'b/c': b'2', 'd': b'3'}), target))
+            self.assertEqual({'a': md5(b'1').hexdigest(), 'b/c': md5(b'2').hexdigest(), 'd': md5(b'3').hexdigest()}, parsemanifest((target / manifestname).read_bytes()))
+            (target / 'local').write_text('mine')
+            self.assertEqual((['b/c', 'e'], ['d']), extractdelta(self._deltatar({'a': b'1', 'b/c': b'22', 'e': b'5'}), target))
+            self.assertEqual({manifestname, 'a', 'b', 'e', 'local'}, {p.name for p in target.iterdir()})
+            self.assertEqual(b'22', (target / 'b' / 'c').read_bytes())
+            (target / 'a').write_bytes(b'')
+            self.assertEqual((['a'], []), extractdelta(self._deltatar({'a': b'1', 'b/c': b'22', 'e': b'5'}), target))
+            (target / manifestname).unlink()
+            self.assertEqual((['a', 'b/c', 'e'], []), extractdelta(self._deltatar({'a': b'1', 'b/c': b'22', 'e': b'5'}), target))
+
+    def test_extractdeltaabi(self):
+        relpathtodata = {'a': b'1', f"{abiprefix}/x86/b/c": b'2', f"{abiprefix}/arm64-v8a/b/c": b'3'}
+        with TemporaryDirectory() as tempdir:
+            target = Path(tempdir)
+            self.assertEqual((['b/c', 'a'], []), extractdelta(self._deltatar(relpathtodata), target, ['arm64-v8a', 'x86']))
+            self.assertEqual({manifestname, 'a', 'b'}, {p.name for p in target.iterdir()})
+            self.assertEqual(b'3', (target / 'b' / 'c').read_bytes())
+            self.assertEqual({'a': md5(b'1').hexdigest(), 'b/c': md5(b'3').hexdigest()}, parsemanifest((target / manifestname).read_bytes()))
+            self.assertEqual(([], []), extractdelta(self._deltatar(relpathtodata), target, ['arm64-v8a', 'x86']))
+            with self.assertRaises(Exception):
+                extractdelta(self._deltatar(relpathtodata), target, ['armeabi-v7a'])
+
+    def test_repackzip(self):
+        with TemporaryDirectory() as tempdir:
+            tempdir = Path(tempdir)
+            srcpath = tempdir / 'app.apk'
+            with ZipFile(srcpath, 'w') as zf:
+                zf.writestr('AndroidManifest.xml', 'm' * 1000, ZIP_DEFLATED)
+                zf.writestr('META-INF/MANIFEST.MF', 'x')
+                zf.writestr('META-INF/CERT.SF', 'x')
+                zf.writestr('assets/private.mp3', 'old')
+                zf.writestr('classes.dex', 'd' * 1000, ZIP_DEFLATED)
+                zf.writestr('lib/x86/libmain.so', 'so', ZIP_STORED)
+                zf.writestr('resources.arsc', 'r', ZIP_STORED)
+            for name, text in ['private.mp3', 'new'], ['private.version', 'v']:
+                (tempdir / name).write_text(text)
+            dstpath = tempdir / 'repack.apk'
+            repackzip(srcpath, dstpath, {f"assets/{name}": tempdir / name for name in ['private.mp3', 'private.version']}, lambda name: not name.startswith('META-INF/'))
+            with ZipFile(srcpath) as src, ZipFile(dstpath) as dst, dstpath.open('rb') as f:
+                self.assertIsNone(dst.testzip())
+                self.assertEqual(['AndroidManifest.xml', 'assets/private.mp3', 'classes.dex', 'lib/x86/libmain.so', 'resources.arsc', 'assets/private.version'], dst.namelist())
+                self.assertEqual(b'new', dst.read('assets/private.mp3'))
+                self.assertEqual(b'v', dst.read('assets/private.version'))
+                for name in 'AndroidManifest.xml', 'classes.dex', 'lib/x86/libmain.so', 'resources.arsc':
+                    self.assertEqual(src.read(name), dst.read(name))
+                    self.assertEqual(src.getinfo(name).compress_type, dst.getinfo(name).compress_type)
+                for info in dst.infolist():
+                    if ZIP_STORED == info.compress_type:
+                        f.seek(info.header_offset)
+                        namelen, extralen = struct.unpack('<26xHH', f.read(30))
+                        self.assertEqual(0, (info.header_offset + 30 + namelen + extralen) % (4096 if info.filename.endswith('.so') else 4))
+
+    def test_unmappablelibs(self):
+        with TemporaryDirectory() as tempdir:
+            tempdir = Path(tempdir)
+            srcpath = tempdir / 'app.apk'
+            with ZipFile(srcpath, 'w') as zf:
+                zf.writestr('a.txt', 'a', ZIP_STORED)
+                zf.writestr('lib/x86/liba.so', 'a', ZIP_STORED)
+                zf.writestr('lib/x86/libb.so', 'b' * 100, ZIP_DEFLATED)
+                zf.writestr('lib/x86/libc.so', 'c', ZIP_STORED)
+            self.assertEqual(['lib/x86/liba.so', 'lib/x86/libb.so', 'lib/x86/libc.so'], unmappablelibs(srcpath))
+            dstpath = tempdir / 'aligned.apk'
+            repackzip(srcpath, dstpath, {}, lambda name: True)
+            self.assertEqual(['lib/x86/libb.so'], unmappablelibs(dstpath))
+            repackzip(srcpath, dstpath, {'lib/x86/libb.so': srcpath}, lambda name: True)
+            self.assertEqual([], unmappablelibs(dstpath))
@@ -0,0 +1,76 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from .benchmark_filter import sampleblacklist, samplepaths, samplewhitelist
+from .filter import compilepatterns, PathFilter, referenceaccept
+from unittest import TestCase
+
+class TestFilter(TestCase):
+
+    whitelist = samplewhitelist
+    blacklist = sampleblacklist
+
+    def test_compilepatterns(self):
+        r = compilepatterns(['*.py', 'a?c'])
+        self.assertTrue(r.match('x.py'))
+        self.assertTrue(r.match('d/x.py'))
+        self.assertTrue(r.match('abc'))
+        self.assertFalse(r.match('x.pyc'))
+        self.assertFalse(r.match('abbc'))
+        self.assertFalse(compilepatterns([]).match(''))
+
+    def test_anchoring(self):
+        f = PathFilter(['keep/*.py'], ['^/root/*', '*.py', 'tests/*'])
+        self.assertFalse(f('/root/x'))
+        self.assertTrue(f('/other/root/x'))
+        self.assertFalse(f('/a/b.py'))
+        self.assertTrue(f('b.py')) # Unanchored patterns need a slash before them.
+        self.assertTrue(f('/a/keep/b.py'))
+        self.assertFalse(f('/a/tests/x'))
+        self.assertTrue(f('/a/mytests/x'))
+        self.assertTrue(PathFilter([], [])('/anything'))
+
+    def test_reference(self):
+        paths = samplepaths(5000)
+        f = PathFilter(self.whitelist, self.blacklist)
+        expected = [referenceaccept(self.whitelist, self.blacklist, p) for p in paths]
+        self.assertEqual(expected, [f(p) for p in paths])
+        self.assertTrue(any(expected))
+        self.assertFalse(all(expected))
@@ -0,0 +1,145 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from .index import RecipeImpls, RecipeIndex
+from importlib import invalidate_caches
+from lagoon.util import atomic
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+import json, os, sys
+
+class Base:
+
+    name = None
+
+class TestIndex(TestCase):
+
+    packagename = 'cowpoxtestrecipes'
+
+    def setUp(self):
+        self.tempdir = TemporaryDirectory()
+        self.cachedir = Path(self.tempdir.name, 'cache')
+        self.packagedir = Path(self.tempdir.name, 'root', self.packagename)
+        self.packagedir.mkdir(parents = True)
+        (self.packagedir / '__init__.py').touch()
+        self._module('a', 'A', 'Foo')
+        self._module('b', 'B', 'bar_baz')
+        sys.path.insert(0, str(self.packagedir.parent))
+
+    def tearDown(self):
+        sys.path.remove(str(self.packagedir.parent))
+        self._forget()
+        self.tempdir.cleanup()
+
+    def _module(self, stem, clsname, name, mtime = 1000000000):
+        path = self.packagedir / f"{stem}.py"
+        path.write_text(f"from {__name__} import Base\nclass {clsname}(Base):\n    name = {name!r}\n")
+        os.utime(path, (mtime, mtime))
+
+    def _forget(self):
+        for name in list(sys.modules):
+            if name == self.packagename or name.startswith(f"{self.packagename}."):
+                del sys.modules[name]
+        invalidate_caches()
+
+    def _load(self):
+        self._forget()
+        return RecipeIndex(self.packagename, Base, self.cachedir).load()
+
+    def test_index(self):
+        expected = {
+            'foo': [f"{self.packagename}.a", 'A'],
+            'bar-baz': [f"{self.packagename}.b", 'B'],
+        }
+        self.assertEqual(expected, self._load())
+        indexpath = self.packagedir / RecipeIndex.filename
+        self.assertEqual({f"{self.packagename}.a", f"{self.packagename}.b"}, json.loads(indexpath.read_text()).keys())
+        self.assertEqual(expected, self._load())
+        self.assertNotIn(f"{self.packagename}.a", sys.modules)
+
+    def test_mtime(self):
+        self._load()
+        self._module('a', 'A2', 'foo2', 1000000001)
+        self.assertEqual({
+            'foo2': [f"{self.packagename}.a", 'A2'],
+            'bar-baz': [f"{self.packagename}.b", 'B'],
+        }, self._load())
+        self.assertIn(f"{self.packagename}.a", sys.modules)
+        self.assertNotIn(f"{self.packagename}.b", sys.modules)
+
+    def test_lazy(self):
+        self._load()
+        self._forget()
+        impls = RecipeImpls([self.packagename], Base, self.cachedir)
+        self.assertIn('foo', impls)
+        self.assertNotIn('bar', impls)
+        self.assertEqual('B', impls.classname('bar-baz'))
+        self.assertNotIn(f"{self.packagename}.a", sys.modules)
+        self.assertNotIn(f"{self.packagename}.b", sys.modules)
+        self.assertEqual('Foo', impls['foo'].name)
+        self.assertIn(f"{self.packagename}.a", sys.modules)
+        self.assertNotIn(f"{self.packagename}.b", sys.modules)
+
+    def test_readonly(self):
+        def readonlyatomic(path):
+            if path.parent == self.packagedir:
+                raise PermissionError(path)
+            return atomic(path)
+        with patch(f"{RecipeIndex.__module__}.atomic", readonlyatomic):
+            self.assertEqual(2, len(self._load()))
+            self.assertFalse((self.packagedir / RecipeIndex.filename).exists())
+            cachepath = self.cachedir / f"{self.packagename}.json"
+            self.assertTrue(cachepath.exists())
+            self._module('a', 'A2', 'foo2', 1000000001)
+            self.assertIn('foo2', self._load())
+            self.assertIn('foo2', json.loads(cachepath.read_text())[f"{self.packagename}.a"]['recipes'])
+
+    def test_packaged(self):
+        self._load()
+        indexpath = self.packagedir / RecipeIndex.filename
+        mtime = indexpath.stat().st_mtime_ns
+        with patch(f"{RecipeIndex.__module__}.atomic") as atomicmock:
+            self.assertEqual(2, len(self._load()))
+        atomicmock.assert_not_called() # Current so not rewritten, nor copied to the cache.
+        self.assertEqual(mtime, indexpath.stat().st_mtime_ns)
+        self.assertFalse(self.cachedir.exists())
+        self.assertNotIn(f"{self.packagename}.a", sys.modules)
@@ -39,10 +39,11 @@
 # THE SOFTWARE.
 
 from .make import Make
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from unittest import TestCase
-import shutil
+import shutil, time
 
 class I: pass
 
@@ -118,6 +119,29 @@ class TestMake(TestCase):
                 I, "[%s] Build OK.", target,
             ], self._pop())
 
+    def test_update(self):
+        updates = []
+        def install():
+            target.mkdir()
+            (target / 'a').touch()
+        def update(olddependencies):
+            updates.append(olddependencies)
+            self.assertFalse((target / '.Cowpox' / 'OK').exists())
+            (target / 'b').touch()
+        with TemporaryDirectory() as tempdir:
+            target = Path(tempdir, 'a')
+            uuid = self.make(target, 100, install, update = update)
+            self.assertEqual(uuid, self.make(target, 100, install, update = update))
+            self.assertEqual([], updates)
+            self._pop()
+            self.assertNotEqual(uuid, self.make(target, 101, install, update = update))
+            self.assertEqual([100], updates)
+            self.assertEqual({'.Cowpox', 'a', 'b'}, {p.name for p in target.iterdir()})
+            self.assertEqual([
+                I, "[%s] Update due to changed dependencies.", target,
+                I, "[%s] Build OK.", target,
+            ], self._pop())
+
     def test_fasterror(self):
         class X(Exception): pass
         def install():
@@ -173,3 +197,21 @@ class TestMake(TestCase):
             self.assertEqual([
                 I, "[%s] Start build.", target,
             ], self._pop())
+
+    def test_shared(self):
+        installs = []
+        def install():
+            installs.append(None)
+            time.sleep(.1)
+            target.mkdir()
+        with TemporaryDirectory() as tempdir:
+            target = Path(tempdir, 'a')
+            with ThreadPoolExecutor(2) as e:
+                uuids = list(e.map(lambda _: self.make(target, None, install, shared = True), range(2)))
+            self.assertEqual(1, len(installs))
+            self.assertEqual(1, len(set(uuids)))
+            self.assertEqual([
+                I, "[%s] Start build.", target,
+                I, "[%s] Build OK.", target,
+                I, "[%s] Already OK.", target,
+            ], self._pop())
@@ -0,0 +1,79 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from .shake import filereachable, modulename, Reachability
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+class TestShake(TestCase):
+
+    def test_modulename(self):
+        self.assertEqual('a', modulename(Path('a.pyc')))
+        self.assertEqual('a.b', modulename(Path('a', 'b.py')))
+        self.assertEqual('a', modulename(Path('a', '__init__.py')))
+        self.assertEqual('_ssl', modulename(Path('_ssl.cpython-38.so')))
+
+    def test_filereachable(self):
+        isreachable = {'json', 'json.decoder'}.__contains__
+        for relpath in 'json/__init__.pyc', 'json/decoder.pyc', 'json/data.txt', 'LICENSE.txt':
+            self.assertTrue(filereachable(isreachable, Path(relpath)), relpath)
+        for relpath in 'json/encoder.pyc', 'xml/__init__.pyc', 'xml/data.txt', '_ssl.so', 'tkinter.py':
+            self.assertFalse(filereachable(isreachable, Path(relpath)), relpath)
+
+    def test_reachability(self):
+        with TemporaryDirectory() as tempdir:
+            app, stdlib = (Path(tempdir, name) for name in ['app', 'stdlib'])
+            for path, text in [
+                    [app / 'main.py', 'import json\nfrom xml import dom\n'],
+                    [stdlib / 'json' / '__init__.py', 'from .decoder import x\nimport _json\n'],
+                    [stdlib / 'json' / 'decoder.py', 'x = 1\n'],
+                    [stdlib / 'xml' / '__init__.py', ''],
+                    [stdlib / 'xml' / 'dom' / '__init__.py', ''],
+                    [stdlib / 'xml' / 'sax.py', ''],
+                    [stdlib / 'tkinter.py', 'import _tkinter\n'],
+                    [stdlib / 'encodings' / '__init__.py', ''],
+                    [stdlib / 'encodings' / 'utf_8.py', '']]:
+                path.pmkdirp().write_text(text)
+            isreachable = Reachability(['main'], [app, stdlib], ['encodings'])
+            for name in 'json', 'json.decoder', '_json', 'xml', 'xml.dom', 'encodings', 'encodings.utf_8':
+                self.assertTrue(isreachable(name), name)
+            for name in 'xml.sax', 'tkinter', '_tkinter':
+                self.assertFalse(isreachable(name), name)
@@ -0,0 +1,61 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from .stages import archstages, changedstages, stagedigests
+from types import SimpleNamespace
+from unittest import TestCase
+
+class TestStages(TestCase):
+
+    def _projectmemo(self, javasrcmemos, librepomemos, privatememos):
+        archbuilds = [SimpleNamespace(arch = SimpleNamespace(name = name), javasrcmemos = javasrcmemos, librepomemos = librepomemos, privatememo = privatememo)
+                for name, privatememo in zip(['arm64-v8a', 'x86_64'], privatememos)]
+        return dict(uuid = None, stages = stagedigests(dict(archstages(archbuilds), resources = ['icon'])))
+
+    def test_purepython(self):
+        old = self._projectmemo(['pyjnius1'], ['python1', 'sdl1'], ['private1', 'private2'])
+        self.assertEqual(set(), changedstages(old, self._projectmemo(['pyjnius1'], ['python1', 'sdl1'], ['private1', 'private2'])))
+        # A pure-Python recipe is neither JavaSrc nor LibRepo, so only the private dirs change:
+        self.assertEqual({'assets'}, changedstages(old, self._projectmemo(['pyjnius1'], ['python1', 'sdl1'], ['private3', 'private4'])))
+        self.assertEqual({'sources', 'assets'}, changedstages(old, self._projectmemo(['pyjnius2'], ['python1', 'sdl1'], ['private3', 'private4'])))
+        self.assertEqual({'libs', 'assets'}, changedstages(old, self._projectmemo(['pyjnius1'], ['python1', 'sdl2'], ['private3', 'private4'])))
+
+    def test_prestages(self):
+        self.assertIsNone(changedstages('uuid', self._projectmemo([], [], ['private1', 'private2'])))
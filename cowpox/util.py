@@ -42,6 +42,7 @@ from chromalog.log import ColorizingFormatter, ColorizingStreamHandler
 from collections.abc import Mapping
 from diapyr import DI, types
 from jproperties import Properties
+from pathlib import Path
 import logging, networkx as nx, os, shutil
 
 build_platform, = (f"{uname.sysname}-{uname.machine}".lower() for uname in [os.uname()])
@@ -122,8 +123,15 @@ class Contrib:
         self.srcdirs = srcdirs
 
     def filepaths(self):
-        for relpath in sorted({path.relative_to(src) for src in self.srcdirs for path in src.rglob('*') if path.is_file()}):
-            yield self.resolve(relpath), relpath
+        'Every file in the srcdirs in order of relative path, where the first srcdir to have a given one wins.'
+        relpathtopath = {}
+        for src in self.srcdirs:
+            for dirpath, _, filenames in os.walk(src):
+                for filename in filenames:
+                    path = Path(dirpath, filename)
+                    relpathtopath.setdefault(path.relative_to(src), path)
+        for relpath in sorted(relpathtopath):
+            yield relpathtopath[relpath], relpath
 
     def resolve(self, relpath):
         for src in self.srcdirs:
@@ -0,0 +1,124 @@
+# Copyright 2020 Andrzej Cichocki
+
+# This file is part of Cowpox.
+#
+# Cowpox is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Cowpox is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Cowpox.  If not, see <http://www.gnu.org/licenses/>.
+
+# This file incorporates work covered by the following copyright and
+# permission notice:
+
+# Copyright (c) 2010-2017 Kivy Team and other contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from . import Arch
+from .cache import KeyCache, keydigest, treedigest
+from aridity.config import Config
+from base64 import urlsafe_b64encode
+from diapyr import types
+from hashlib import sha256
+from packaging.utils import canonicalize_name
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZipFile
+import logging
+
+log = logging.getLogger(__name__)
+
+class Wheelhouse:
+    'Wheels of installed recipe output, keyed by recipe inputs so that other builds and projects can skip the compile.'
+
+    wheelversion = '1.0'
+
+    @types(Config, Arch)
+    def __init__(self, config, arch):
+        self.cache = KeyCache(Path(config.wheelhouse.dir))
+        self.plattag = f"android_{config.android.ndk_api}_{arch.name}".replace('-', '_').replace('.', '_')
+
+    def install(self, recipe, env, build):
+        distname = canonicalize_name(recipe.name).replace('-', '_')
+        version = getattr(recipe, 'version', '0')
+        pytag = f"cp{recipe.interpreterrecipe.majminversion.replace('.', '')}"
+        tag = f"{pytag}-{pytag}-{self.plattag}"
+        key = keydigest([
+            recipe.name,
+            version,
+            tag,
+            sorted([k, str(v)] for k, v in env.items()),
+            treedigest(recipe.recipebuilddir),
+        ])
+        entry = self.cache.get(key)
+        if entry is None:
+            log.info("[%s] Build wheel.", recipe.name)
+            build()
+            with self.cache.put(key) as partialpath:
+                partialpath.mkdir()
+                self._pack(recipe.bundlepackages, partialpath / f"{distname}-{version}-{tag}.whl", distname, version, tag)
+        else:
+            wheelpath, = entry.glob('*.whl')
+            log.info("[%s] Install cached wheel: %s", recipe.name, wheelpath)
+            self._unpack(wheelpath, recipe.bundlepackages)
+
+    def _distinfo(self, root, paths, distname, version, tag):
+        'Relative path and content of each metadata file, which go in the wheel but not the bundle.'
+        distinfo = Path(f"{distname}-{version}.dist-info")
+        files = [
+            [distinfo / 'METADATA', f"Metadata-Version: 2.1\nName: {distname}\nVersion: {version}\n"],
+            [distinfo / 'WHEEL', f"Wheel-Version: {self.wheelversion}\nGenerator: Cowpox\nRoot-Is-Purelib: false\nTag: {tag}\n"],
+        ]
+        record = []
+        for relpath, text in files:
+            data = text.encode()
+            record.append(f"{relpath},sha256={urlsafe_b64encode(sha256(data).digest()).rstrip(b'=').decode()},{len(data)}\n")
+        for path in paths:
+            data = path.read_bytes()
+            record.append(f"{path.relative_to(root)},sha256={urlsafe_b64encode(sha256(data).digest()).rstrip(b'=').decode()},{len(data)}\n")
+        record.append(f"{distinfo / 'RECORD'},,\n")
+        files.append([distinfo / 'RECORD', ''.join(record)])
+        return files
+
+    def _pack(self, root, wheelpath, distname, version, tag):
+        paths = [path for path in sorted(root.rglob('*')) if path.is_file()]
+        with ZipFile(wheelpath, 'w', ZIP_DEFLATED) as zf:
+            for path in paths:
+                zf.write(path, path.relative_to(root)) # Also records the mode.
+            for relpath, text in self._distinfo(root, paths, distname, version, tag):
+                zf.writestr(str(relpath), text)
+
+    @staticmethod
+    def _unpack(wheelpath, root):
+        'Same tree as a wheel miss leaves, including modes.'
+        with ZipFile(wheelpath) as zf:
+            for info in zf.infolist():
+                if info.filename.split('/')[0].endswith('.dist-info'):
+                    continue
+                path = Path(zf.extract(info, root))
+                mode = info.external_attr >> 16 & 0o7777
+                if mode:
+                    path.chmod(mode)